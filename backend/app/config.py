@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     DB_NAME: str = "disclaimer_checker"
     GEMINI_API_KEY: Optional[str] = None
     GEMINI_MODEL: Optional[str] = None  # Optional model name
+    GEMINI_MAX_CONCURRENCY: int = 5  # Max in-flight Gemini requests per process
     ENV: Optional[str] = None  # Optional environment name
     
     class Config:
@@ -13,3 +13,4 @@ db = client[settings.DB_NAME]
 
 approved_collection = db["approved_disclaimers"]
 analyses_collection = db["analyses"]
+llm_cache_collection = db["llm_cache"]
@@ -1,8 +1,12 @@
 # app/main.py
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import analyze, approved
 
+# Configure the root logger once so app.services.* loggers are emitted
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
 app = FastAPI(
     title="Marketing Disclaimer Checker API",
     description="API for analyzing marketing PDFs for disclaimer compliance",
@@ -1,5 +1,5 @@
 # app/models.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Dict, List, Optional
 from enum import Enum
 from datetime import datetime
@@ -30,6 +30,8 @@ class ApprovedDisclaimer(BaseModel):
 
 
 class DetectedDisclaimer(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     text: str
     jurisdiction: Optional[Jurisdiction] = None
     confidence: Optional[float] = None
@@ -62,6 +64,7 @@ class ViolationDetail(BaseModel):
     """A violation with optional exact text to highlight in the PDF."""
     violation: str
     exact_text: Optional[str] = None  # Exact quote from document that violates (for highlighting)
+    page: Optional[int] = None  # 1-based page of exact_text, when known
 
 
 class ComparisonResult(BaseModel):
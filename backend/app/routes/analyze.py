@@ -1,5 +1,6 @@
 # app/routes/analyze.py
 from fastapi import APIRouter, UploadFile, File, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from app.models import AnalysisResponse, Jurisdiction
 from app.services.detect import detect_jurisdictions_and_disclaimers
@@ -42,8 +43,10 @@ async def analyze_pdf(
         if len(pdf_bytes) == 0:
             raise HTTPException(status_code=400, detail="PDF file is empty")
         
+        # The detection, comparison, analysis and annotation steps block on Gemini / PyMuPDF, so run
+        # them in the threadpool instead of on the event loop; concurrent uploads then overlap
         # Detect jurisdictions and extract disclaimers for each
-        jurisdictions_detected, all_detected = detect_jurisdictions_and_disclaimers(pdf_bytes)
+        jurisdictions_detected, all_detected = await run_in_threadpool(detect_jurisdictions_and_disclaimers, pdf_bytes)
         
         # Use first disclaimer as primary for backward compatibility
         primary_detected = all_detected[0] if all_detected else None
@@ -51,10 +54,11 @@ async def analyze_pdf(
         # Compare with approved disclaimers for primary disclaimer
         comparison_results = []
         if primary_detected:
-            comparison_results = compare_with_approved(primary_detected, jurisdiction)
+            comparison_results = await run_in_threadpool(compare_with_approved, primary_detected, jurisdiction)
         
         # Generate analysis result (applies relevant checklist to each jurisdiction and entire document)
-        analysis_result = generate_analysis_result(
+        analysis_result = await run_in_threadpool(
+            generate_analysis_result,
             primary_detected,
             all_detected,
             jurisdictions_detected,
@@ -64,7 +68,8 @@ async def analyze_pdf(
         )
         
         # Generate annotated PDF and collect comments
-        annotated_pdf_bytes, comments = process_pdf_page_by_page(
+        annotated_pdf_bytes, comments = await run_in_threadpool(
+            process_pdf_page_by_page,
             pdf_bytes,
             analysis_result,
             all_detected
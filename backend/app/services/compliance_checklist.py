@@ -3,7 +3,9 @@
 Compliance checklist requirements for marketing materials.
 Exact checklist as provided by compliance department.
 """
-from typing import List, Tuple
+import hashlib
+from functools import lru_cache
+from typing import Dict, Tuple
 
 GENERAL_REQUIREMENTS = """
 GENERAL REQUIREMENTS FOR ALL MARKETING MATERIALS - (APPLICABLE TO ALL COUNTRIES)
@@ -92,9 +94,10 @@ In accordance with Chapter Seven of Module Eight (Conduct of Business) of the Ex
 """
 
 
+@lru_cache(maxsize=64)
 def get_checklist_for_jurisdiction(jurisdiction: str = None) -> str:
     """
-    Get relevant compliance checklist based on jurisdiction.
+    Get relevant compliance checklist based on jurisdiction (cached; the checklist text is constant).
     
     Args:
         jurisdiction: Jurisdiction name (Oman, Qatar, DIFC, KSA, UAE, Kuwait) or None for general only
@@ -119,6 +122,49 @@ def get_checklist_for_jurisdiction(jurisdiction: str = None) -> str:
     return checklist
 
 
+@lru_cache(maxsize=64)
+def get_checklist_hash(jurisdiction: str = None) -> str:
+    """
+    Short digest of the checklist text for a jurisdiction, computed once per jurisdiction.
+    Use it in cache keys so entries built from an older checklist text are never reused.
+    """
+    return hashlib.blake2b(get_checklist_for_jurisdiction(jurisdiction).encode(), digest_size=8).hexdigest()
+
+
+# Standard wordings that, when present verbatim (case/whitespace-insensitive) in a disclaimer, satisfy a
+# required-statement item without an LLM call. Keyed by a lowercase fragment of the checklist item text.
+# Only add phrasings compliance would accept as-is; anything else still goes to the LLM.
+CANONICAL_PHRASES: Dict[str, Tuple[str, ...]] = {
+    "past performance is not necessarily": (
+        "past performance is not necessarily",
+        "past performance is not indicative of future",
+        "past performance is not a guide to future",
+        "past performance is not a reliable indicator of future",
+        "past performance is no guarantee of future",
+        "past performance does not guarantee future",
+    ),
+    "prepared for promotional purposes": (
+        "prepared for promotional purposes",
+        "for promotional purposes only",
+    ),
+    "intended only for professional clients or market counterparties": (
+        "intended only for professional clients",
+        "only intended for professional clients",
+        "directed only at professional clients",
+    ),
+}
+
+
+@lru_cache(maxsize=256)
+def get_canonical_phrases(item_text: str) -> Tuple[str, ...]:
+    """Accepted standard wordings (lowercase) for a checklist item, or () if it has none."""
+    t = item_text.lower()
+    for fragment, phrases in CANONICAL_PHRASES.items():
+        if fragment in t:
+            return phrases
+    return ()
+
+
 def is_prohibition_item(item_text: str) -> bool:
     """
     True if this checklist item is a prohibition (must not / should not).
@@ -133,15 +179,17 @@ def is_prohibition_item(item_text: str) -> bool:
     )
 
 
-def parse_checklist_items(checklist_text: str) -> List[tuple[str, str, bool]]:
+@lru_cache(maxsize=64)
+def parse_checklist_items(checklist_text: str) -> Tuple[Tuple[str, str, bool], ...]:
     """
-    Parse checklist text into individual items.
+    Parse checklist text into individual items. Cached per checklist text, so the result is
+    an immutable tuple shared between callers.
     
     Args:
         checklist_text: Full checklist text
         
     Returns:
-        List of (item_text, section_name, is_required) tuples
+        Tuple of (item_text, section_name, is_required) tuples
     """
     items = []
     current_section = "GENERAL REQUIREMENTS"
@@ -182,4 +230,16 @@ def parse_checklist_items(checklist_text: str) -> List[tuple[str, str, bool]]:
             if item_text:
                 items.append((item_text, current_section, is_required))
     
-    return items
+    return tuple(items)
+
+
+@lru_cache(maxsize=64)
+def format_checklist_items(checklist_text: str, indent: str = "  ") -> str:
+    """
+    Numbered item list for prompts ("1. item *REQUIRED*" per line), built from
+    parse_checklist_items and cached per checklist text and indent.
+    """
+    return "\n".join(
+        f"{indent}{i+1}. {item_text} {'*REQUIRED*' if is_required else ''}"
+        for i, (item_text, _, is_required) in enumerate(parse_checklist_items(checklist_text))
+    )
@@ -4,18 +4,31 @@
 import google.generativeai as genai
 from app.config import settings
 from app.models import DetectedDisclaimer, Jurisdiction
-from typing import Optional, List, Tuple
-import re
-import tempfile
-import os
-import json
+from app.services.gemini_client import JSON_FENCE_RE, get_model
+from app.services.gemini_files import shared_pdf_upload
+from app.services.llm_cache import llm_cache_get, llm_cache_key, llm_cache_put
+from typing import Dict, Optional, List, Tuple
+import hashlib
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on a single extracted disclaimer; Gemini is asked for "complete full text"
+MAX_DISCLAIMER_CHARS = 65536
+
+# Configure the Gemini client once at import instead of on every detection call
+_GEMINI_READY = False
+if settings.GEMINI_API_KEY:
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    _GEMINI_READY = True
 
 
 def initialize_gemini():
-    """Initialize Gemini API client."""
-    if not settings.GEMINI_API_KEY:
+    """Ensure the Gemini API client has been configured."""
+    if not _GEMINI_READY:
         raise ValueError("GEMINI_API_KEY not set in environment variables")
-    genai.configure(api_key=settings.GEMINI_API_KEY)
 
 
 def detect_jurisdictions_and_disclaimers(pdf_bytes: bytes) -> Tuple[List[str], List[DetectedDisclaimer]]:
@@ -28,12 +41,11 @@ def detect_jurisdictions_and_disclaimers(pdf_bytes: bytes) -> Tuple[List[str], L
     Returns:
         Tuple of (detected_jurisdictions, disclaimers)
     """
-    if not settings.GEMINI_API_KEY:
+    if not _GEMINI_READY:
         raise ValueError("GEMINI_API_KEY is required. Please set it in your .env file.")
     
-    initialize_gemini()
     # Model initialization - generation config passed to generate_content
-    model = genai.GenerativeModel('gemini-3-flash-preview')
+    model = get_model()
     
     prompt = """You are analyzing a marketing material document for financial products. This is a LEGAL matter - be DETERMINISTIC and THOROUGH.
 
@@ -114,16 +126,13 @@ If no disclaimers found, return:
 
 Extract all disclaimers completely. Flag violations."""
     
-    # Save PDF bytes to temporary file for Gemini upload
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(pdf_bytes)
-        tmp_file_path = tmp_file.name
-    
-    try:
-        # Upload PDF file to Gemini
-        uploaded_file = genai.upload_file(path=tmp_file_path, mime_type="application/pdf")
-        
-        try:
+    # Re-runs on the same PDF reuse the stored detection answer (keyed by prompt and document digest)
+    cache_key = llm_cache_key("detection_v1", prompt, hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest())
+    response_text = llm_cache_get(cache_key)
+    fresh = response_text is None
+    if fresh:
+        # Upload PDF to Gemini (shared with the report steps for the same document)
+        with shared_pdf_upload(pdf_bytes) as uploaded_file:
             # Generate content with PDF - use deterministic generation
             # For large PDFs, increase output tokens and ensure all pages are processed
             response = model.generate_content(
@@ -135,41 +144,22 @@ Extract all disclaimers completely. Flag violations."""
                     "max_output_tokens": 8192  # Increased for large PDFs (50+ pages)
                 }
             )
-            response_text = response.text
-            
-            # Debug: print response for troubleshooting
-            print(f"Gemini Response: {response_text[:1000]}")
-            
-        finally:
-            # Clean up uploaded file from Gemini
-            try:
-                genai.delete_file(uploaded_file.name)
-            except:
-                pass
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_file_path):
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
-    
-    # Parse JSON response
-    response_text = response_text.strip()
-    if response_text.startswith("```json"):
-        response_text = response_text[7:]
-    if response_text.startswith("```"):
-        response_text = response_text[3:]
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    response_text = response_text.strip()
+        response_text = response.text
+
+        # Debug: log response for troubleshooting
+        logger.debug("Gemini response: %.1000s", response_text)
+
+        # Parse JSON response
+        response_text = JSON_FENCE_RE.match(response_text).group(1)
     
     try:
-        data = json.loads(response_text)
-    except json.JSONDecodeError as e:
-        print(f"Failed to parse JSON response: {e}")
-        print(f"Response was: {response_text[:500]}")
+        data = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        logger.exception("Failed to parse detection JSON response")
+        logger.debug("Raw response: %.500s", response_text)
         return [], []
+    if fresh:
+        llm_cache_put(cache_key, response_text)
     
     # Extract jurisdictions
     jurisdictions_detected = data.get("jurisdictions_detected", [])
@@ -177,22 +167,22 @@ Extract all disclaimers completely. Flag violations."""
     # Extract disclaimers
     disclaimers = []
     for disc_data in data.get("disclaimers", []):
-        jur_name = disc_data.get("jurisdiction", "").strip()
-        disclaimer_text = disc_data.get("disclaimer_text", "").strip()
+        jur_name = (disc_data.get("jurisdiction") or "").strip()
+        # Cap before validation; DetectedDisclaimer strips surrounding whitespace itself
+        disclaimer_text = (disc_data.get("disclaimer_text") or "")[:MAX_DISCLAIMER_CHARS]
+        
+        if len(disclaimer_text) < 10:
+            continue
         
-        if not disclaimer_text or len(disclaimer_text) < 10:
+        disclaimer = DetectedDisclaimer(text=disclaimer_text, confidence=0.9)
+        if len(disclaimer.text) < 10:
             continue
         
         # Map jurisdiction name to enum
-        detected_jurisdiction = None
         if jur_name.lower() not in ['general', 'unknown', 'all', 'common']:
-            detected_jurisdiction = match_jurisdiction_name(jur_name)
+            disclaimer.jurisdiction = match_jurisdiction_name(jur_name)
         
-        disclaimers.append(DetectedDisclaimer(
-            text=disclaimer_text,
-            jurisdiction=detected_jurisdiction,
-            confidence=0.9
-        ))
+        disclaimers.append(disclaimer)
     
     # Extract document violations (promises of returns/gains found anywhere in document)
     document_violations = data.get("document_violations", [])
@@ -212,6 +202,23 @@ Extract all disclaimers completely. Flag violations."""
     return jurisdictions_detected, disclaimers
 
 
+# Lowercase enum values, enum names and common long-form names -> Jurisdiction
+_JURISDICTION_LOOKUP: Dict[str, Jurisdiction] = {}
+for _jur in Jurisdiction:
+    _JURISDICTION_LOOKUP[_jur.value.lower()] = _jur
+    _JURISDICTION_LOOKUP[_jur.name.lower()] = _jur
+_JURISDICTION_LOOKUP.update({
+    "united arab emirates": Jurisdiction.UAE,
+    "state of kuwait": Jurisdiction.KUWAIT,
+    "state of qatar": Jurisdiction.QATAR,
+    "sultanate of oman": Jurisdiction.OMAN,
+    "saudi": Jurisdiction.KSA,
+    "saudi arabia": Jurisdiction.KSA,
+    "kingdom of saudi arabia": Jurisdiction.KSA,
+    "dubai international financial centre": Jurisdiction.DIFC,
+})
+
+
 def match_jurisdiction_name(jur_name: str) -> Optional[Jurisdiction]:
     """Match jurisdiction name to enum."""
     if not jur_name:
@@ -219,6 +226,11 @@ def match_jurisdiction_name(jur_name: str) -> Optional[Jurisdiction]:
     
     jur_lower = jur_name.lower().strip()
     
+    # Exact names and known aliases resolve with a single lookup
+    jur = _JURISDICTION_LOOKUP.get(jur_lower)
+    if jur is not None:
+        return jur
+    
     # Direct matches
     for jur in Jurisdiction:
         if (jur.value.lower() == jur_lower or 
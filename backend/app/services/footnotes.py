@@ -3,11 +3,15 @@
 Extract and validate footnotes, detect unusual colored text, and flag existing highlights in PDFs.
 """
 import re
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
 
 # PyMuPDF annotation type for highlight (PDF_ANNOT_HIGHLIGHT = 8)
 PDF_ANNOT_HIGHLIGHT = 8
 
+# Bare footnote reference spans ("1", "12", "*", "**")
+_REF_RE = re.compile(r"\d+|\*+")
+
 
 def extract_footnotes_from_pdf(pdf_bytes: bytes) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
     """
@@ -22,71 +26,89 @@ def extract_footnotes_from_pdf(pdf_bytes: bytes) -> Tuple[Dict[str, str], Dict[s
         - locations: ref -> {"page": int, "bbox": [x0, y0, x1, y1]} for first line of each footnote (for highlighting)
     """
     import fitz
-    result: Dict[str, str] = {}
-    locations: Dict[str, Dict[str, Any]] = {}
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            page_height = page.rect.height
-            footnote_y_threshold = page_height * 0.75
-            blocks = page.get_text("dict").get("blocks", [])
-            for block in blocks:
-                if block.get("type") != 0:
-                    continue
-                bbox = block.get("bbox", (0, 0, 0, 0))
-                y0 = bbox[1]
-                if y0 < footnote_y_threshold:
-                    continue
-                for line in block.get("lines", []):
-                    line_text_parts = []
-                    line_bbox = None
-                    for span in line.get("spans", []):
-                        line_text_parts.append(span.get("text", ""))
-                        if line_bbox is None and span.get("bbox"):
-                            line_bbox = list(span["bbox"])
-                    line_text = "".join(line_text_parts).strip()
-                    if not line_text or len(line_text) < 2:
-                        continue
-                    num_match = re.match(r"^(\d+)[\.\)\s]+(.+)$", line_text)
-                    aster_match = re.match(r"^(\*+)\s+(.+)$", line_text)
-                    if num_match:
-                        key = num_match.group(1).strip()
-                        text = num_match.group(2).strip()
-                        if key and text:
-                            result[key] = text
-                            if line_bbox is not None:
-                                locations[key] = {"page": page_num + 1, "bbox": line_bbox}
-                    elif aster_match:
-                        key = aster_match.group(1).strip()
-                        text = aster_match.group(2).strip()
-                        if key and text:
-                            result[key] = text
-                            if line_bbox is not None:
-                                locations[key] = {"page": page_num + 1, "bbox": line_bbox}
-                    elif result:
-                        last_key = list(result.keys())[-1]
-                        result[last_key] = result[last_key] + " " + line_text
-        doc.close()
     except Exception:
-        pass
+        return {}, {}
+    try:
+        return _extract_footnotes(doc)
+    finally:
+        doc.close()
+
+
+def _extract_footnotes(doc) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    """Footnote extraction over an already-opened fitz.Document (see extract_footnotes_from_pdf)."""
+    footnote_lines: List[Tuple[int, str, Optional[List[float]]]] = []
+    _scan_document(doc, footnote_lines=footnote_lines)
+    return _footnotes_from_lines(footnote_lines)
+
+
+def _footnotes_from_lines(
+    footnote_lines: List[Tuple[int, str, Optional[List[float]]]],
+) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    """
+    Build the footnote dictionary from below-threshold lines, in document order.
+    Lines that do not start a new footnote are appended to the previous one.
+    """
+    result: Dict[str, str] = {}
+    locations: Dict[str, Dict[str, Any]] = {}
+    last_key: Optional[str] = None
+    for page_no, line_text, line_bbox in footnote_lines:
+        key, text = _parse_footnote_line(line_text)
+        if key is not None:
+            if key and text:
+                result[key] = text
+                last_key = key
+                if line_bbox is not None:
+                    locations[key] = {"page": page_no, "bbox": line_bbox}
+        elif last_key is not None:
+            result[last_key] += " " + line_text
     return result, locations
 
 
-def _span_is_footnote_ref(span_text: str) -> Optional[str]:
+def _parse_footnote_line(s: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Split a footnote definition line into (key, text), or (None, None) if it does not start one.
+    Hand-rolled equivalent of ^(\d+)[\.\)\s]+(.+)$ and ^(\*+)\s+(.+)$ without the regex
+    engine: "1. text", "2) text", "3 text", "* text", "** text".
+    """
+    n = len(s)
+    if not n:
+        return None, None
+    i = 0
+    if s[0].isdecimal():
+        while i < n and s[i].isdecimal():
+            i += 1
+        j = i
+        while j < n and (s[j] in ".)" or s[j].isspace()):
+            j += 1
+    elif s[0] == "*":
+        while i < n and s[i] == "*":
+            i += 1
+        j = i
+        while j < n and s[j].isspace():
+            j += 1
+    else:
+        return None, None
+    if j == i:
+        return None, None
+    if j == n:
+        # The regex would backtrack one separator char into the text group
+        if j - i < 2:
+            return None, None
+        j -= 1
+    return s[:i], s[j:].strip()
+
+
+def _span_is_footnote_ref(t: str) -> Optional[str]:
     """
-    Treat a span as a footnote reference if its entire text is a number or asterisks.
+    Treat a span as a footnote reference if its entire (already stripped) text is a number or asterisks.
     This catches superscript/subscript refs (typically in a separate small span).
     Returns the reference string (e.g. "1", "*") or None.
     """
-    t = span_text.strip()
     if not t:
         return None
-    if re.fullmatch(r"\d+", t):
-        return t
-    if re.fullmatch(r"\*+", t):
-        return t
-    return None
+    return t if _REF_RE.fullmatch(t) else None
 
 
 def _span_footnote_refs(span_text: str) -> List[str]:
@@ -97,17 +119,19 @@ def _span_footnote_refs(span_text: str) -> List[str]:
     t = span_text.strip()
     if not t:
         return []
+    if "," not in t:
+        # Single ref in whole span; refs are 1-3 characters, so longer body spans are skipped unmatched
+        if len(t) > 4:
+            return []
+        single = _span_is_footnote_ref(t)
+        return [single] if single else []
     # Comma-separated refs (e.g. "11,12" in one superscript span)
-    parts = [p.strip() for p in t.split(",") if p.strip()]
     refs: List[str] = []
-    for p in parts:
-        if re.fullmatch(r"\d+", p) or re.fullmatch(r"\*+", p):
+    for p in t.split(","):
+        p = p.strip()
+        if p and _REF_RE.fullmatch(p):
             refs.append(p)
-    if refs:
-        return refs
-    # Single ref in whole span
-    single = _span_is_footnote_ref(t)
-    return [single] if single else []
+    return refs
 
 
 def check_footnote_references(
@@ -124,55 +148,143 @@ def check_footnote_references(
         List of issues: { "page": int, "issue_type": str, "message": str, "reference": str, "bbox": [x0,y0,x1,y1]? }
     """
     import fitz
-    issues = []
     if not footnotes:
-        return issues
+        return []
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception:
+        return []
+    try:
+        return _check_footnote_references(doc, footnotes)
+    finally:
+        doc.close()
+
+
+def _check_footnote_references(doc, footnotes: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Reference check over an already-opened fitz.Document (see check_footnote_references)."""
+    import fitz
+    if not footnotes:
+        return []
+    ref_candidates: List[Tuple[int, str, Optional[List[float]]]] = []
+    try:
         for page_num in range(len(doc)):
             page = doc[page_num]
-            page_no = page_num + 1
-            blocks = page.get_text("dict").get("blocks", [])
-            page_height = page.rect.height
-            footnote_y_threshold = page_height * 0.75
-            seen_refs_this_page: set = set()
-            for block in blocks:
-                if block.get("type") != 0:
-                    continue
-                bbox = block.get("bbox", (0, 0, 0, 0))
-                if bbox[1] >= footnote_y_threshold:
-                    continue
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        text = span.get("text", "")
-                        refs_in_span = _span_footnote_refs(text)
-                        span_bbox = span.get("bbox")
-                        for ref in refs_in_span:
-                            if ref in seen_refs_this_page:
-                                continue
-                            seen_refs_this_page.add(ref)
-                            if ref not in footnotes:
-                                issues.append({
-                                    "page": page_no,
-                                    "issue_type": "footnote_reference_missing",
-                                    "message": f"Footnote reference '{ref}' has no matching footnote in this document.",
-                                    "reference": ref,
-                                    "bbox": list(span_bbox) if span_bbox else None,
-                                })
-        doc.close()
+            footnote_y_threshold = page.rect.height * 0.75
+            # Same flags get_text("dict") uses on its own (mediabox clip, ligatures, whitespace)
+            textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+            # Footnote-only pages have no body text to hold references; skip building their dict
+            if not any(b[1] < footnote_y_threshold and b[6] == 0 for b in page.get_text("blocks", textpage=textpage)):
+                continue
+            _scan_page(page.get_text("dict", textpage=textpage), page_num, ref_candidates=ref_candidates)
     except Exception:
         pass
+    return _missing_reference_issues(ref_candidates, footnotes)
+
+
+def _missing_reference_issues(
+    ref_candidates: List[Tuple[int, str, Optional[List[float]]]],
+    footnotes: Dict[str, str],
+) -> List[Dict[str, Any]]:
+    """Turn collected body references into issues for refs with no matching footnote."""
+    issues = []
+    if not footnotes:
+        return issues
+    for page_no, ref, span_bbox in ref_candidates:
+        if ref not in footnotes:
+            issues.append({
+                "page": page_no,
+                "issue_type": "footnote_reference_missing",
+                "message": f"Footnote reference '{ref}' has no matching footnote in this document.",
+                "reference": ref,
+                "bbox": span_bbox,
+            })
     return issues
 
 
+def _scan_page(
+    page_dict: Dict[str, Any],
+    page_num: int,
+    ref_candidates: Optional[list] = None,
+    color_issues: Optional[list] = None,
+    footnote_lines: Optional[list] = None,
+) -> None:
+    """
+    Walk one page's text dict (page.get_text("dict")) once and feed every span-level check that was asked for:
+    - ref_candidates: (page, ref, bbox) for the first occurrence of each body reference on the page
+    - color_issues: red-text issue dicts (any position on the page)
+    - footnote_lines: (page, line_text, first_span_bbox) for lines below the footnote threshold
+    Pass None for outputs that are not needed.
+    """
+    page_no = page_num + 1
+    footnote_y_threshold = page_dict.get("height", 0) * 0.75
+    seen_refs_this_page: set = set()
+    for block in page_dict.get("blocks", []):
+        if block.get("type") != 0:
+            continue
+        bbox = block.get("bbox", (0, 0, 0, 0))
+        in_body = bbox[1] < footnote_y_threshold
+        if in_body and ref_candidates is None and color_issues is None:
+            continue
+        if not in_body and footnote_lines is None and color_issues is None:
+            continue
+        for line in block.get("lines", []):
+            line_text_parts = []
+            line_bbox = None
+            for span in line.get("spans", []):
+                text = span.get("text", "")
+                if color_issues is not None:
+                    _collect_red_span(span, text, page_no, color_issues)
+                if in_body:
+                    if ref_candidates is None:
+                        continue
+                    for ref in _span_footnote_refs(text):
+                        if ref in seen_refs_this_page:
+                            continue
+                        seen_refs_this_page.add(ref)
+                        span_bbox = span.get("bbox")
+                        ref_candidates.append((page_no, ref, list(span_bbox) if span_bbox else None))
+                elif footnote_lines is not None:
+                    line_text_parts.append(text)
+                    if line_bbox is None and span.get("bbox"):
+                        line_bbox = list(span["bbox"])
+            if not in_body and footnote_lines is not None:
+                line_text = "".join(line_text_parts).strip()
+                if line_text and len(line_text) >= 2:
+                    footnote_lines.append((page_no, line_text, line_bbox))
+
+
+def _scan_document(
+    doc,
+    ref_candidates: Optional[list] = None,
+    color_issues: Optional[list] = None,
+    footnote_lines: Optional[list] = None,
+    page_dicts: Optional[Dict[int, Dict[str, Any]]] = None,
+) -> None:
+    """
+    Run _scan_page over every page; on a parse error keep whatever was collected so far.
+    If page_dicts is given, each page's text dict is stored in it (1-based page -> dict) for reuse.
+    """
+    try:
+        for page_num in range(len(doc)):
+            page_dict = doc[page_num].get_text("dict")
+            if page_dicts is not None:
+                page_dicts[page_num + 1] = page_dict
+            _scan_page(page_dict, page_num, ref_candidates, color_issues, footnote_lines)
+    except Exception:
+        pass
+
+
 def find_ref_bbox_on_page(
     pdf_bytes: bytes,
     page_1based: int,
     ref_text: str,
+    page_dicts: Optional[Dict[int, Dict[str, Any]]] = None,
 ) -> Optional[List[float]]:
     """
-    Find the bbox of a footnote reference on a page. Looks for spans whose text matches ref_text
-    and whose font size is smaller than the page median (superscript/small refs).
+    Find the bbox of a footnote reference on a page: the first span above the footnote area
+    whose text matches ref_text (superscript/small refs are typically their own span).
+    page_dicts is an optional 1-based page -> text dict cache (as filled by
+    run_footnote_and_formatting_checks); pages missing from it are parsed and added.
     Returns [x0, y0, x1, y1] or None.
     """
     import fitz
@@ -180,76 +292,41 @@ def find_ref_bbox_on_page(
         return None
     ref_text = ref_text.strip()
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        page_idx = page_1based - 1
-        if page_idx < 0 or page_idx >= len(doc):
-            doc.close()
-            return None
-        page = doc[page_idx]
-        page_height = page.rect.height
-        footnote_y_threshold = page_height * 0.75
-        blocks = page.get_text("dict").get("blocks", [])
-        sizes = []
-        candidate_bbox = None
-        for block in blocks:
-            if block.get("type") != 0:
-                continue
-            bbox = block.get("bbox", (0, 0, 0, 0))
-            if bbox[1] >= footnote_y_threshold:
-                continue
-            for line in block.get("lines", []):
-                for span in line.get("spans", []):
-                    text = (span.get("text") or "").strip()
-                    size = span.get("size")
-                    if size is not None:
-                        sizes.append(float(size))
-                    if text == ref_text:
-                        span_bbox = span.get("bbox")
-                        if span_bbox:
-                            candidate_bbox = list(span_bbox)
-                            break
-                if candidate_bbox is not None:
-                    break
-            if candidate_bbox is not None:
-                break
-        if candidate_bbox is not None:
-            doc.close()
-            return candidate_bbox
-        # If no exact match, try matching with size heuristic: prefer small spans (superscript)
-        if sizes:
-            import statistics
-            median_size = statistics.median(sizes)
-            small_threshold = median_size * 0.92
-        else:
-            small_threshold = None
-        for block in blocks:
-            if block.get("type") != 0:
-                continue
-            bbox = block.get("bbox", (0, 0, 0, 0))
-            if bbox[1] >= footnote_y_threshold:
-                continue
-            for line in block.get("lines", []):
-                for span in line.get("spans", []):
-                    text = (span.get("text") or "").strip()
-                    size = span.get("size")
-                    if text == ref_text:
-                        span_bbox = span.get("bbox")
-                        if span_bbox:
-                            if small_threshold is None or (size is not None and float(size) <= small_threshold):
-                                doc.close()
-                                return list(span_bbox)
-                            if candidate_bbox is None:
-                                candidate_bbox = list(span_bbox)
-                if candidate_bbox is not None:
-                    break
-            if candidate_bbox is not None:
-                break
-        doc.close()
-        return list(candidate_bbox) if candidate_bbox else None
+        page_dict = page_dicts.get(page_1based) if page_dicts is not None else None
+        if page_dict is None:
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            try:
+                page_idx = page_1based - 1
+                if page_idx < 0 or page_idx >= len(doc):
+                    return None
+                page_dict = doc[page_idx].get_text("dict")
+            finally:
+                doc.close()
+            if page_dicts is not None:
+                page_dicts[page_1based] = page_dict
+        return _ref_bbox_in_page_dict(page_dict, ref_text)
     except Exception:
         return None
 
 
+def _ref_bbox_in_page_dict(page_dict: Dict[str, Any], ref_text: str) -> Optional[List[float]]:
+    """find_ref_bbox_on_page over an already-extracted page text dict: first matching body span wins."""
+    footnote_y_threshold = page_dict.get("height", 0) * 0.75
+    for block in page_dict.get("blocks", []):
+        if block.get("type") != 0:
+            continue
+        bbox = block.get("bbox", (0, 0, 0, 0))
+        if bbox[1] >= footnote_y_threshold:
+            continue
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                if (span.get("text") or "").strip() == ref_text:
+                    span_bbox = span.get("bbox")
+                    if span_bbox:
+                        return list(span_bbox)
+    return None
+
+
 def get_unusual_colored_text(pdf_bytes: bytes) -> List[Dict[str, Any]]:
     """
     Flag only red text (edit remnants like track-changes or comments). Ignore bold, blue headings, etc.
@@ -258,42 +335,63 @@ def get_unusual_colored_text(pdf_bytes: bytes) -> List[Dict[str, Any]]:
         List of { "page": int, "text": str, "color_hex": str, "bbox": tuple } for red text only.
     """
     import fitz
-    NORMAL_COLOR = 0
-    issues = []
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception:
+        return []
+    try:
+        return _unusual_colored_text(doc)
+    finally:
+        doc.close()
+
+
+def _unusual_colored_text(doc) -> List[Dict[str, Any]]:
+    """Red-text scan over an already-opened fitz.Document (see get_unusual_colored_text)."""
+    import fitz
+    color_issues: List[Dict[str, Any]] = []
+    try:
         for page_num in range(len(doc)):
             page = doc[page_num]
-            blocks = page.get_text("dict").get("blocks", [])
-            for block in blocks:
-                if block.get("type") != 0:
-                    continue
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        color = span.get("color")
-                        text = (span.get("text") or "").strip()
-                        if not text or len(text) < 2:
-                            continue
-                        if color is None or color == NORMAL_COLOR:
-                            continue
-                        if not isinstance(color, int) or color == 0:
-                            continue
-                        r = (color >> 16) & 0xFF
-                        g = (color >> 8) & 0xFF
-                        b = color & 0xFF
-                        # Only flag red / red-orange (edit remnants): R dominant, G and B low
-                        if r >= 100 and g <= 120 and b <= 120 and (r > g or r > b):
-                            color_hex = f"#{r:02x}{g:02x}{b:02x}"
-                            issues.append({
-                                "page": page_num + 1,
-                                "text": text[:100],
-                                "color_hex": color_hex,
-                                "bbox": tuple(span.get("bbox", (0, 0, 0, 0))),
-                            })
-        doc.close()
+            # One text extraction per page; the cheap tuple view decides whether the span dict is needed
+            textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+            if not any(b[6] == 0 for b in page.get_text("blocks", textpage=textpage)):
+                continue
+            _scan_page(page.get_text("dict", textpage=textpage), page_num, color_issues=color_issues)
     except Exception:
         pass
-    return issues
+    return color_issues
+
+
+def _collect_red_span(span: Dict[str, Any], raw_text: str, page_no: int, issues: List[Dict[str, Any]]) -> None:
+    """Append an issue if this span is red / red-orange text (edit remnant)."""
+    color = span.get("color")
+    # Most spans are black (0); reject them before touching the text
+    if not color or not isinstance(color, int):
+        return
+    color_hex = _red_color_hex(color)
+    if color_hex is None:
+        return
+    text = (raw_text or "").strip()
+    if not text or len(text) < 2:
+        return
+    issues.append({
+        "page": page_no,
+        "text": text[:100],
+        "color_hex": color_hex,
+        "bbox": tuple(span.get("bbox", (0, 0, 0, 0))),
+    })
+
+
+@lru_cache(maxsize=1024)
+def _red_color_hex(color: int) -> Optional[str]:
+    """Hex string for a red / red-orange sRGB int, else None. Cached: documents use few distinct colors."""
+    r = (color >> 16) & 0xFF
+    g = (color >> 8) & 0xFF
+    b = color & 0xFF
+    # Only flag red / red-orange (edit remnants): R dominant, G and B low
+    if r >= 100 and g <= 120 and b <= 120 and (r > g or r > b):
+        return f"#{color & 0xFFFFFF:06x}"
+    return None
 
 
 def get_existing_highlights(pdf_bytes: bytes) -> List[Dict[str, Any]]:
@@ -304,31 +402,42 @@ def get_existing_highlights(pdf_bytes: bytes) -> List[Dict[str, Any]]:
         List of { "page": int, "message": str, "rect": list }
     """
     import fitz
-    results = []
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception:
+        return []
+    try:
+        return _existing_highlights(doc)
+    finally:
+        doc.close()
+
+
+def _existing_highlights(doc) -> List[Dict[str, Any]]:
+    """Highlight-annotation scan over an already-opened fitz.Document (see get_existing_highlights)."""
+    results = []
+    try:
         for page_num in range(len(doc)):
             page = doc[page_num]
-            for annot in page.annots() or []:
+            # Type filter is applied by MuPDF; everything yielded is a highlight
+            for annot in page.annots(types=[PDF_ANNOT_HIGHLIGHT]) or []:
                 try:
-                    atype = getattr(annot, "type", None)
-                    is_highlight = atype and (atype[0] == PDF_ANNOT_HIGHLIGHT if isinstance(atype, (list, tuple)) else atype == PDF_ANNOT_HIGHLIGHT)
-                    if is_highlight:
-                        rect = annot.rect
-                        results.append({
-                            "page": page_num + 1,
-                            "message": "Existing highlight found in document (review or remove before finalising).",
-                            "rect": [rect.x0, rect.y0, rect.x1, rect.y1],
-                        })
+                    rect = annot.rect
+                    results.append({
+                        "page": page_num + 1,
+                        "message": "Existing highlight found in document (review or remove before finalising).",
+                        "rect": [rect.x0, rect.y0, rect.x1, rect.y1],
+                    })
                 except Exception:
                     continue
-        doc.close()
     except Exception:
         pass
     return results
 
 
-def run_footnote_and_formatting_checks(pdf_bytes: bytes) -> Tuple[
+def run_footnote_and_formatting_checks(
+    pdf_bytes: bytes,
+    page_dicts: Optional[Dict[int, Dict[str, Any]]] = None,
+) -> Tuple[
     Dict[str, str],
     Dict[str, Dict[str, Any]],
     List[Dict[str, Any]],
@@ -337,12 +446,27 @@ def run_footnote_and_formatting_checks(pdf_bytes: bytes) -> Tuple[
 ]:
     """
     Run all footnote and formatting checks.
+    If page_dicts is given, it is filled with each page's text dict so follow-up lookups
+    (find_ref_bbox_on_page) can reuse them instead of re-opening and re-parsing the PDF.
 
     Returns:
         (footnotes dict, footnote_locations ref->{page,bbox}, footnote_issues, unusual_color_issues, existing_highlight_issues)
     """
-    footnotes, footnote_locations = extract_footnotes_from_pdf(pdf_bytes)
-    footnote_issues = check_footnote_references(pdf_bytes, footnotes)
-    unusual_color_issues = get_unusual_colored_text(pdf_bytes)
-    existing_highlight_issues = get_existing_highlights(pdf_bytes)
+    import fitz
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception:
+        return {}, {}, [], [], []
+    # Parse once and walk each page's text dict a single time for all span-level checks;
+    # body references are validated after the footnote section (often at the end) is known
+    ref_candidates: List[Tuple[int, str, Optional[List[float]]]] = []
+    unusual_color_issues: List[Dict[str, Any]] = []
+    footnote_lines: List[Tuple[int, str, Optional[List[float]]]] = []
+    try:
+        _scan_document(doc, ref_candidates, unusual_color_issues, footnote_lines, page_dicts)
+        footnotes, footnote_locations = _footnotes_from_lines(footnote_lines)
+        footnote_issues = _missing_reference_issues(ref_candidates, footnotes)
+        existing_highlight_issues = _existing_highlights(doc)
+    finally:
+        doc.close()
     return footnotes, footnote_locations, footnote_issues, unusual_color_issues, existing_highlight_issues
@@ -0,0 +1,25 @@
+# app/services/gemini_client.py
+# Note: google.generativeai is deprecated in favor of google.genai
+# Keeping current package for now as it still works. Consider migrating to google.genai in future.
+import google.generativeai as genai
+from app.config import settings
+from functools import lru_cache
+import re
+
+# Gemini model used by every LLM step; also part of the LLM answer cache key, so switching
+# models never serves answers cached from the previous one
+GEMINI_MODEL_NAME = settings.GEMINI_MODEL or "gemini-3-flash-preview"
+
+# Deterministic sampling used by the legal compliance checks
+DETERMINISTIC_CONFIG = {"temperature": 0.0, "top_p": 0.95, "top_k": 40}
+
+# Optional ```json / ``` fences around a model's JSON reply (either side may be missing)
+JSON_FENCE_RE = re.compile(r"^\s*(?:```(?:json)?)?\s*(.*?)\s*(?:```)?\s*$", re.DOTALL)
+
+
+@lru_cache(maxsize=2)
+def get_model(deterministic: bool = False) -> genai.GenerativeModel:
+    """Shared GenerativeModel handle (one per config) so its client/transport is reused across calls."""
+    if deterministic:
+        return genai.GenerativeModel(GEMINI_MODEL_NAME, generation_config=DETERMINISTIC_CONFIG)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
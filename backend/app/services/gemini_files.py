@@ -0,0 +1,117 @@
+# app/services/gemini_files.py
+# Note: google.generativeai is deprecated in favor of google.genai
+# Keeping current package for now as it still works. Consider migrating to google.genai in future.
+import google.generativeai as genai
+from google.api_core.exceptions import NotFound, PermissionDenied
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+import hashlib
+import io
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# PDFs uploaded to Gemini, keyed by a digest of their bytes, so detection, the report's LLM
+# steps and recommendations for the same document share one upload. Each upload counts the
+# callers currently using it. An entry unused for _UPLOAD_TTL_SECONDS is dropped on a later
+# call (well inside Gemini's own 48h file expiry), and past _MAX_UPLOADS the least recently
+# used entry is dropped. A dropped upload is deleted from Gemini once no caller still holds it.
+_UPLOAD_TTL_SECONDS = 15 * 60
+_MAX_UPLOADS = 32
+
+
+class _Upload:
+    __slots__ = ("file", "last_used", "refs", "evicted")
+
+    def __init__(self, uploaded_file: Any, now: float):
+        self.file = uploaded_file
+        self.last_used = now
+        self.refs = 0
+        self.evicted = False
+
+
+_uploads: Dict[bytes, _Upload] = {}
+_uploads_lock = threading.Lock()
+
+
+def _delete_quietly(uploaded_file: Any) -> None:
+    try:
+        genai.delete_file(uploaded_file.name)
+    except (NotFound, PermissionDenied) as e:
+        logger.debug("Could not delete uploaded file %s: %s", uploaded_file.name, e)
+    except Exception as e:
+        # Cleanup runs after the caller's request has succeeded (or while acquiring a handle),
+        # so it must never raise; Gemini expires the file after 48h anyway
+        logger.warning("Failed to delete uploaded file %s: %s", uploaded_file.name, e)
+
+
+def _evict_locked(upload: _Upload, to_delete: List[Any]) -> None:
+    """Mark an entry already removed from _uploads as evicted; delete it now only if unused."""
+    upload.evicted = True
+    if upload.refs == 0:
+        to_delete.append(upload.file)
+
+
+def _acquire(pdf_bytes: bytes) -> _Upload:
+    key = hashlib.blake2b(pdf_bytes, digest_size=16).digest()
+    now = time.monotonic()
+    to_delete: List[Any] = []
+    with _uploads_lock:
+        for k, upload in list(_uploads.items()):
+            if upload.refs == 0 and now - upload.last_used > _UPLOAD_TTL_SECONDS:
+                del _uploads[k]
+                _evict_locked(upload, to_delete)
+        upload = _uploads.pop(key, None)
+        if upload is not None:
+            _uploads[key] = upload  # re-insert as most recently used
+            upload.refs += 1
+            upload.last_used = now
+    for f in to_delete:
+        _delete_quietly(f)
+    if upload is not None:
+        return upload
+
+    # Uploaded straight from memory; no temp file on disk
+    uploaded_file = genai.upload_file(io.BytesIO(pdf_bytes), mime_type="application/pdf", display_name=f"doc-{key.hex()}.pdf")
+
+    with _uploads_lock:
+        upload = _uploads.get(key)
+        if upload is None:
+            upload = _Upload(uploaded_file, now)
+            _uploads[key] = upload
+            uploaded_file = None
+            while len(_uploads) > _MAX_UPLOADS:
+                _evict_locked(_uploads.pop(next(iter(_uploads))), to_delete)
+        upload.refs += 1
+        upload.last_used = now
+    if uploaded_file is not None:
+        # Another request uploaded the same document meanwhile; keep theirs
+        to_delete.append(uploaded_file)
+    for f in to_delete:
+        _delete_quietly(f)
+    return upload
+
+
+def _release(upload: _Upload) -> None:
+    with _uploads_lock:
+        upload.refs -= 1
+        upload.last_used = time.monotonic()
+        unused = upload.evicted and upload.refs == 0
+    if unused:
+        _delete_quietly(upload.file)
+
+
+@contextmanager
+def shared_pdf_upload(pdf_bytes: bytes) -> Iterator[Any]:
+    """
+    Yield a Gemini file handle for the PDF, uploading it only if this document has no live upload.
+    The handle stays valid until the with block exits; callers must not delete it themselves.
+    """
+    upload = _acquire(pdf_bytes)
+    try:
+        yield upload.file
+    finally:
+        _release(upload)
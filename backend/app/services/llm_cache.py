@@ -0,0 +1,62 @@
+# app/services/llm_cache.py
+from app.database import llm_cache_collection
+from app.services.gemini_client import GEMINI_MODEL_NAME
+from typing import Any, Optional
+import datetime
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Persistent LLM answer cache (MongoDB llm_cache collection), keyed by a sha256 of the namespace,
+# model and every prompt input. Entries expire after _LLM_CACHE_TTL via a TTL index. If the
+# database errors, the cache is skipped for _LLM_CACHE_RETRY_SECONDS so calls are not slowed down.
+_LLM_CACHE_TTL = datetime.timedelta(days=30)
+_LLM_CACHE_RETRY_SECONDS = 60.0
+_llm_cache_state = {"disabled_until": 0.0, "indexed": False}
+
+
+def _llm_cache_available() -> bool:
+    return time.monotonic() >= _llm_cache_state["disabled_until"]
+
+
+def _llm_cache_back_off(e: Exception) -> None:
+    logger.warning("LLM answer cache unavailable, skipping it for %.0fs: %s", _LLM_CACHE_RETRY_SECONDS, e)
+    _llm_cache_state["disabled_until"] = time.monotonic() + _LLM_CACHE_RETRY_SECONDS
+
+
+def llm_cache_key(namespace: str, *parts: Any) -> str:
+    """Cache key for an LLM answer; whitespace in text parts is collapsed so reflowed text still hits."""
+    normalized = [" ".join(p.split()) if isinstance(p, str) else repr(p) for p in parts]
+    return hashlib.sha256("|".join([namespace, GEMINI_MODEL_NAME, *normalized]).encode()).hexdigest()
+
+
+def llm_cache_get(key: str) -> Optional[Any]:
+    """Cached value for key, or None on a miss (or when the cache is unavailable)."""
+    if not _llm_cache_available():
+        return None
+    try:
+        doc = llm_cache_collection.find_one({"_id": key}, {"value": 1})
+    except Exception as e:
+        _llm_cache_back_off(e)
+        return None
+    return doc["value"] if doc else None
+
+
+def llm_cache_put(key: str, value: Any) -> None:
+    """Store a successfully parsed LLM answer; failures only pause the cache."""
+    if not _llm_cache_available():
+        return
+    try:
+        if not _llm_cache_state["indexed"]:
+            llm_cache_collection.create_index("created_at", expireAfterSeconds=int(_LLM_CACHE_TTL.total_seconds()))
+            _llm_cache_state["indexed"] = True
+        llm_cache_collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "created_at": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True,
+        )
+    except Exception as e:
+        _llm_cache_back_off(e)
@@ -4,16 +4,28 @@
 import google.generativeai as genai
 from app.config import settings
 from app.models import DetectedDisclaimer
+from app.services.compliance_checklist import get_checklist_for_jurisdiction
+from app.services.gemini_client import JSON_FENCE_RE, get_model
+from app.services.gemini_files import shared_pdf_upload
 from typing import List, Dict, Optional
-import re
-import json
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+# Configure the Gemini client at import, like detect and report: genai.configure drops the
+# SDK's cached clients, so configuring lazily mid-request would rebuild the shared channel
+_GEMINI_READY = False
+if settings.GEMINI_API_KEY:
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    _GEMINI_READY = True
 
 
 def initialize_gemini():
-    """Initialize Gemini API client."""
-    if not settings.GEMINI_API_KEY:
+    """Ensure the Gemini API client has been configured."""
+    if not _GEMINI_READY:
         raise ValueError("GEMINI_API_KEY not set in environment variables")
-    genai.configure(api_key=settings.GEMINI_API_KEY)
 
 
 class IssueRecommendation:
@@ -47,7 +59,7 @@ def get_detailed_recommendations(
     
     try:
         initialize_gemini()
-        model = genai.GenerativeModel('gemini-3-flash-preview')
+        model = get_model()
         
         # Prepare context
         comparison_info = ""
@@ -61,7 +73,6 @@ Comparison with approved disclaimer:
 """
         
         # Get compliance checklist for jurisdiction
-        from app.services.compliance_checklist import get_checklist_for_jurisdiction
         jurisdiction_name = detected.jurisdiction.value if detected.jurisdiction else None
         checklist = get_checklist_for_jurisdiction(jurisdiction_name)
         
@@ -113,47 +124,23 @@ If the disclaimer meets all requirements, return: {{"issues": []}}
 
 Be accurate and conservative - only flag real compliance issues."""
         
-        # Upload PDF for context
-        import tempfile
-        import os
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(pdf_bytes)
-            tmp_file_path = tmp_file.name
-        
-        try:
-            uploaded_file = genai.upload_file(path=tmp_file_path, mime_type="application/pdf")
-            try:
-                # Use deterministic generation with temperature=0
-                response = model.generate_content(
-                    [prompt, uploaded_file],
-                    generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40}
-                )
-                response_text = response.text
-            finally:
-                try:
-                    genai.delete_file(uploaded_file.name)
-                except:
-                    pass
-        finally:
-            if os.path.exists(tmp_file_path):
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
+        # Upload PDF for context (reuses the upload made for detection/report of the same document)
+        with shared_pdf_upload(pdf_bytes) as uploaded_file:
+            # Use deterministic generation with temperature=0
+            # Stream so the reply is received incrementally rather than in one blocking read
+            response = model.generate_content(
+                [prompt, uploaded_file],
+                generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40},
+                stream=True,
+            )
+            response_text = "".join(chunk.text for chunk in response if chunk.parts)
         
         # Parse JSON response
         # Clean up response text (remove markdown code blocks if present)
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        response_text = JSON_FENCE_RE.match(response_text).group(1)
         
         try:
-            data = json.loads(response_text)
+            data = orjson.loads(response_text)
             issues = data.get("issues", [])
             
             recommendations = []
@@ -167,11 +154,11 @@ Be accurate and conservative - only flag real compliance issues."""
                 recommendations.append(rec)
             
             return recommendations
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM JSON response: {e}")
-            print(f"Response was: {response_text[:500]}")
+        except orjson.JSONDecodeError:
+            logger.exception("Failed to parse recommendations JSON response")
+            logger.debug("Raw response: %.500s", response_text)
             return []
         
-    except Exception as e:
-        print(f"Error getting detailed recommendations: {e}")
+    except Exception:
+        logger.exception("Error getting detailed recommendations")
         return []
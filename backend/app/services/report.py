@@ -2,22 +2,261 @@
 # Note: google.generativeai is deprecated in favor of google.genai
 # Keeping current package for now as it still works. Consider migrating to google.genai in future.
 import google.generativeai as genai
-import json
+from google.generativeai import caching
+from google.api_core.exceptions import (
+    DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable,
+)
+import fitz  # PyMuPDF
+import datetime
+import hashlib
+import logging
+import orjson
+import random
+import re
+import threading
+import time
 from app.config import settings
 from app.models import (
     AnalysisResult, DetectedDisclaimer, ComparisonResult,
     MissingPhrase, RiskLevel, ChecklistItem, ChecklistResult, ViolationDetail,
     FootnoteIssue, FormattingIssue,
 )
+from app.services.compliance_checklist import (
+    format_checklist_items, get_canonical_phrases, get_checklist_for_jurisdiction, get_checklist_hash,
+    parse_checklist_items, is_prohibition_item,
+)
+from app.services.footnotes import run_footnote_and_formatting_checks, find_ref_bbox_on_page
+from app.services.gemini_client import GEMINI_MODEL_NAME, JSON_FENCE_RE, get_model
+from app.services.gemini_files import shared_pdf_upload
+from app.services.llm_cache import llm_cache_get, llm_cache_key, llm_cache_put
 from app.services.rules import classify_risk_level, determine_approval_status
-from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+class _ChecklistItemStatus(BaseModel):
+    item: str
+    section: str
+    is_compliant: bool
+    missing_details: str
+
+
+class _MissingRequired(BaseModel):
+    element: str
+    checklist_reference: str
+
+
+class _Violation(BaseModel):
+    violation: str
+    checklist_reference: str
+
+
+class _ComplianceResponse(BaseModel):
+    """Gemini JSON-mode schema for check_checklist_compliance."""
+    missing_required: List[_MissingRequired]
+    violations: List[_Violation]
+
+
+class _ChecklistItemsResponse(_ComplianceResponse):
+    """Gemini JSON-mode schema for check_checklist_compliance_with_items."""
+    checklist_items: List[_ChecklistItemStatus]
+
 
+class _SingleItemVerdict(BaseModel):
+    """Gemini JSON-mode schema for _check_single_checklist_item."""
+    is_compliant: bool
+    missing_details: str = ""
+    exact_highlight_text: str = ""
 
-def initialize_gemini():
-    """Initialize Gemini API client."""
-    if settings.GEMINI_API_KEY:
-        genai.configure(api_key=settings.GEMINI_API_KEY)
+
+class _ItemVerdict(BaseModel):
+    idx: int
+    is_compliant: bool
+    missing_details: str
+    exact_highlight_text: str
+
+
+class _ItemVerdictsResponse(BaseModel):
+    """Gemini JSON-mode schema for _check_items_batched."""
+    results: List[_ItemVerdict]
+
+
+class _FootnoteIssue(BaseModel):
+    issue_type: str
+    message: str
+    footnote_ref: str
+
+
+class _FootnoteIssuesResponse(BaseModel):
+    """Gemini JSON-mode schema for get_footnote_issues_from_llm."""
+    issues: List[_FootnoteIssue]
+
+
+# Configure the Gemini client once at import instead of on every LLM call
+if settings.GEMINI_API_KEY:
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+
+
+# Transient Gemini errors worth retrying (rate limit / overload / timeouts)
+_RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError)
+
+
+def _call_with_retry(fn, attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+    """
+    Call fn(), retrying transient Gemini errors with jittered exponential backoff (up to 0.5s, 1s, ...,
+    capped at max_delay), so concurrent callers that hit the same 429 do not retry in lockstep.
+    Other (terminal) errors propagate immediately.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except _RETRYABLE_ERRORS:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+
+
+# Caps in-flight Gemini requests across all thread-pool fan-outs in this module; only leaf
+# generate_content calls acquire it, so nested pools cannot deadlock on it
+_GEMINI_LIMITER = threading.BoundedSemaphore(settings.GEMINI_MAX_CONCURRENCY)
+
+
+def _generate_content(model: genai.GenerativeModel, contents, **kwargs):
+    """model.generate_content under the concurrency cap; the slot is released while backing off."""
+    def call():
+        with _GEMINI_LIMITER:
+            return model.generate_content(contents, **kwargs)
+    return _call_with_retry(call, attempts=4)
+
+
+# Characters per Gemini token, learned once with count_tokens so prompts can be capped by
+# tokens without an extra RPC per call; None until measured
+_chars_per_token_ratio: Optional[float] = None
+_DEFAULT_CHARS_PER_TOKEN = 4.0
+
+def _chars_per_token(sample: str) -> float:
+    """
+    Chars-per-token ratio of the shared model, measured on the first sample seen. If counting
+    fails the 4.0 default is kept too, so a degraded API is not asked again for every long text.
+    """
+    global _chars_per_token_ratio
+    ratio = _chars_per_token_ratio
+    if ratio is not None:
+        return ratio
+    model = get_model()
+
+    def call():
+        with _GEMINI_LIMITER:
+            return model.count_tokens(sample)
+    try:
+        total_tokens = _call_with_retry(call).total_tokens
+        ratio = len(sample) / max(total_tokens, 1)
+    except Exception as e:
+        logger.warning("count_tokens failed, assuming %.1f chars per token: %s", _DEFAULT_CHARS_PER_TOKEN, e)
+        ratio = _DEFAULT_CHARS_PER_TOKEN
+    _chars_per_token_ratio = ratio
+    return ratio
+
+
+def _truncate_for_prompt(text: str, max_tokens: int = 1500) -> str:
+    """Cap text at roughly max_tokens Gemini tokens (prefix cut using the learned chars-per-token ratio)."""
+    # Every token covers at least one character, so short texts never need measuring
+    if not text or len(text) <= max_tokens:
+        return text
+    max_chars = int(max_tokens * _chars_per_token(text))
+    return text if len(text) <= max_chars else text[:max_chars]
+
+
+# Explicit context caches for the invariant checklist part of prompts, keyed by
+# (prompt kind, jurisdiction, checklist hash); the rest of each static prompt is fixed in
+# source, so the precomputed checklist hash identifies it. False marks a prefix the API
+# refused to cache (e.g. below the minimum token count) so we do not retry it per call.
+_CHECKLIST_CACHE_TTL = datetime.timedelta(minutes=10)
+_CHECKLIST_CACHE_REFRESH = datetime.timedelta(seconds=60)
+_checklist_cache: Dict[Tuple[str, str, str], Any] = {}
+# The global lock only guards the dicts; create/update RPCs run under a per-key lock, so a slow
+# RPC for one checklist never blocks lookups for another and each key is created only once
+_checklist_cache_lock = threading.Lock()
+_checklist_key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+
+def _expires_soon(cached) -> bool:
+    try:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return cached.expire_time - now < _CHECKLIST_CACHE_REFRESH
+    except Exception:
+        return True
+
+
+def _get_cached_checklist_model(kind: str, jurisdiction_name: Optional[str], static_prompt: str):
+    """
+    Return a GenerativeModel bound to a CachedContent holding static_prompt (checklist + rules),
+    creating or refreshing the cache as needed. Returns None if context caching is unavailable,
+    in which case callers send the full prompt as before.
+    """
+    jur = jurisdiction_name or "General"
+    key = (kind, jur, get_checklist_hash(jurisdiction_name))
+    with _checklist_cache_lock:
+        cached = _checklist_cache.get(key)
+        key_lock = _checklist_key_locks.setdefault(key, threading.Lock())
+    if cached is False:
+        return None
+    if cached is None or _expires_soon(cached):
+        with key_lock:
+            # Re-check: another thread may have created or refreshed it while we waited
+            with _checklist_cache_lock:
+                cached = _checklist_cache.get(key)
+            if cached is False:
+                return None
+            if cached is not None and _expires_soon(cached):
+                try:
+                    cached.update(ttl=_CHECKLIST_CACHE_TTL)
+                except Exception:
+                    cached = None
+            if cached is None:
+                try:
+                    cached = caching.CachedContent.create(
+                        model=f"models/{GEMINI_MODEL_NAME}",
+                        display_name=f"checklist-{kind}-{jur}"[:128],
+                        contents=[static_prompt],
+                        ttl=_CHECKLIST_CACHE_TTL,
+                    )
+                except Exception as e:
+                    logger.info("Context cache unavailable for %s (%s), sending full prompt: %s", kind, jur, e)
+                    cached = False
+                with _checklist_cache_lock:
+                    _checklist_cache[key] = cached
+                if cached is False:
+                    return None
+    return genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+
+def _generate_with_checklist_cache(
+    kind: str,
+    jurisdiction_name: Optional[str],
+    static_prompt: str,
+    call_prompt: str,
+    generation_config: dict,
+    model: Optional[genai.GenerativeModel] = None,
+):
+    """
+    generate_content with the static checklist prompt served from a context cache when possible;
+    otherwise the static and per-call parts are sent together in one prompt.
+    """
+    cached_model = None
+    try:
+        cached_model = _get_cached_checklist_model(kind, jurisdiction_name, static_prompt)
+    except Exception as e:
+        logger.warning("Context cache lookup failed for %s: %s", kind, e)
+    if cached_model is not None:
+        return _generate_content(cached_model, call_prompt, generation_config=generation_config)
+    if model is None:
+        model = get_model()
+    return _generate_content(model, static_prompt + "\n\n" + call_prompt, generation_config=generation_config)
 
 
 def get_llm_suggestions(
@@ -40,37 +279,18 @@ def get_llm_suggestions(
         return None
     
     try:
-        initialize_gemini()
-        # Use deterministic generation config for legal compliance
-        generation_config = {
-            "temperature": 0.0,  # Completely deterministic
-            "top_p": 0.95,
-            "top_k": 40,
-        }
-        model = genai.GenerativeModel('gemini-3-flash-preview', generation_config=generation_config)
-        
-        best_match_info = ""
-        if comparison_results:
-            best = comparison_results[0]
-            best_match_info = f"Best match similarity: {best.similarity_score:.2f}\n"
-            best_match_info += f"Matched phrases: {', '.join(best.matched_phrases[:5])}\n"
-            best_match_info += f"Missing phrases: {', '.join(best.missing_phrases[:5])}"
+        # Deterministic generation config for legal compliance
+        model = get_model(deterministic=True)
         
         # Get compliance checklist for context
-        from app.services.compliance_checklist import get_checklist_for_jurisdiction
         jurisdiction_name = detected.jurisdiction.value if detected.jurisdiction else None
         checklist = get_checklist_for_jurisdiction(jurisdiction_name)
         
-        prompt = f"""You are a compliance analyst reviewing a marketing disclaimer. ONLY flag issues that violate the compliance checklist below.
+        static_prompt = f"""You are a compliance analyst reviewing a marketing disclaimer. ONLY flag issues that violate the compliance checklist below.
 
 COMPLIANCE CHECKLIST:
 {checklist}
 
-Detected Disclaimer:
-{detected.text[:2000]}
-
-Jurisdiction: {jurisdiction_name or 'Unknown'}
-
 CRITICAL RULES:
 1. ONLY flag issues that are explicitly mentioned in the compliance checklist above
 2. Do NOT make up issues or flag things not in the checklist
@@ -91,12 +311,22 @@ TYPE: [issue type]
 If the disclaimer meets all checklist requirements, respond: "No issues found. Disclaimer is compliant with the checklist."
 
 ONLY flag checklist violations - nothing else."""
+        call_prompt = f"""Detected Disclaimer:
+{_truncate_for_prompt(detected.text, 500)}
+
+Jurisdiction: {jurisdiction_name or 'Unknown'}"""
         
-        # Use deterministic generation with temperature=0
-        response = model.generate_content(
-            prompt,
-            generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40}
+        cache_key = llm_cache_key("suggestions_v1", call_prompt, get_checklist_hash(jurisdiction_name))
+        cached = llm_cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Use deterministic generation with temperature=0; checklist prefix comes from the context cache
+        response = _generate_with_checklist_cache(
+            "suggestions", jurisdiction_name, static_prompt, call_prompt,
+            {"temperature": 0.0, "top_p": 0.95, "top_k": 40}, model,
         )
+        llm_cache_put(cache_key, response.text)
         return response.text
         
     except Exception as e:
@@ -184,6 +414,31 @@ def generate_summary_blurb(
     return " ".join(parts)
 
 
+def _uniform_checklist_items(
+    jurisdiction: Optional[str], is_compliant: bool, missing_details: str
+) -> Tuple[ChecklistItem, ...]:
+    """Checklist items all carrying the same status (uncached; used directly for per-error messages)."""
+    return tuple(
+        ChecklistItem.model_construct(
+            item=item_text,
+            section=section,
+            is_required=is_required,
+            is_compliant=is_compliant,
+            missing_details=missing_details
+        )
+        for item_text, section, is_required in parse_checklist_items(get_checklist_for_jurisdiction(jurisdiction))
+    )
+
+
+@lru_cache(maxsize=64)
+def _placeholder_checklist_items(jurisdiction: Optional[str], is_compliant: bool, missing_details: str) -> Tuple[ChecklistItem, ...]:
+    """
+    _uniform_checklist_items for the fixed not-analyzed / all-compliant statuses, cached per jurisdiction;
+    items are never mutated, so callers share them via list(). Never pass free-form text (e.g. error messages).
+    """
+    return _uniform_checklist_items(jurisdiction, is_compliant, missing_details)
+
+
 def check_checklist_compliance_with_items(
     detected: Optional[DetectedDisclaimer],
     jurisdiction: Optional[str] = None
@@ -198,33 +453,13 @@ def check_checklist_compliance_with_items(
     Returns:
         Tuple of (missing_phrases, checklist_violations, checklist_items_status)
     """
-    from app.services.compliance_checklist import get_checklist_for_jurisdiction, parse_checklist_items
-    
     if not settings.GEMINI_API_KEY or not detected:
         # Return empty results with all items marked as non-compliant
-        checklist_text = get_checklist_for_jurisdiction(jurisdiction)
-        items = parse_checklist_items(checklist_text)
-        checklist_items = [
-            ChecklistItem(
-                item=item_text,
-                section=section,
-                is_required=is_required,
-                is_compliant=False,
-                missing_details="Disclaimer not analyzed"
-            )
-            for item_text, section, is_required in items
-        ]
-        return [], [], checklist_items
+        return [], [], list(_placeholder_checklist_items(jurisdiction, False, "Disclaimer not analyzed"))
     
     try:
-        initialize_gemini()
-        # Use deterministic generation config for legal compliance
-        generation_config = {
-            "temperature": 0.0,  # Completely deterministic
-            "top_p": 0.95,
-            "top_k": 40,
-        }
-        model = genai.GenerativeModel('gemini-3-flash-preview', generation_config=generation_config)
+        # Deterministic generation config for legal compliance
+        model = get_model(deterministic=True)
         
         # Get compliance checklist
         jurisdiction_name = detected.jurisdiction.value if detected.jurisdiction else jurisdiction
@@ -232,19 +467,13 @@ def check_checklist_compliance_with_items(
         checklist_items_parsed = parse_checklist_items(checklist)
         
         # Include ALL checklist items (required and optional) for comprehensive checking
-        all_items_list = "\n".join([f"{i+1}. {item_text} {'*REQUIRED*' if is_required else ''}" 
-                                   for i, (item_text, _, is_required) in enumerate(checklist_items_parsed)])
+        all_items_list = format_checklist_items(checklist, indent="")
         
-        prompt = f"""You are a compliance analyst checking a disclaimer against a regulatory compliance checklist. This is a LEGAL matter - be DETERMINISTIC, THOROUGH, and CONSISTENT.
+        static_prompt = f"""You are a compliance analyst checking a disclaimer against a regulatory compliance checklist. This is a LEGAL matter - be DETERMINISTIC, THOROUGH, and CONSISTENT.
 
 COMPLIANCE CHECKLIST ITEMS:
 {all_items_list}
 
-DETECTED DISCLAIMER TEXT:
-{detected.text[:5000] if len(detected.text) > 5000 else detected.text}
-
-JURISDICTION: {jurisdiction_name or 'General'}
-
 DETERMINISTIC RULES (FOLLOW EXACTLY):
 1. For EACH numbered checklist item above, check if it is present/compliant in the disclaimer text
 2. Use EXACT text matching - search for the exact phrases/requirements mentioned in each item
@@ -291,93 +520,69 @@ Respond in this EXACT JSON format (no markdown, no extra text):
 If everything is compliant, return all items with "is_compliant": true and empty arrays for missing_required and violations.
 
 CRITICAL: Be CONSISTENT - same input must produce same output. Use exact matching, not interpretation."""
+        call_prompt = f"""DETECTED DISCLAIMER TEXT:
+{_truncate_for_prompt(detected.text, 1250)}
+
+JURISDICTION: {jurisdiction_name or 'General'}"""
         
-        # Use deterministic generation with temperature=0 and output limit for speed
-        response = model.generate_content(
-            prompt,
-            generation_config={
+        # Use deterministic generation with temperature=0 and output limit for speed;
+        # checklist prefix comes from the context cache
+        response = _generate_with_checklist_cache(
+            "items", jurisdiction_name, static_prompt, call_prompt,
+            {
                 "temperature": 0.0,
                 "top_p": 0.95,
                 "top_k": 40,
-                "max_output_tokens": 2048  # Limit response size
-            }
+                "max_output_tokens": 2048,  # Limit response size
+                # Native JSON mode: the model emits raw JSON matching the schema (no fences)
+                "response_mime_type": "application/json",
+                "response_schema": _ChecklistItemsResponse,
+            },
+            model,
         )
-        response_text = response.text.strip()
-        
-        # Parse JSON
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        response_text = response.text
         
         try:
-            data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error in check_checklist_compliance_with_items: {e}")
-            print(f"Response: {response_text[:500]}")
-            # Return compliant state on parse error to be conservative
-            checklist_text = get_checklist_for_jurisdiction(jurisdiction_name if 'jurisdiction_name' in locals() else jurisdiction)
-            items = parse_checklist_items(checklist_text)
-            checklist_items = [
-                ChecklistItem(
-                    item=item_text,
-                    section=section,
-                    is_required=is_required,
-                    is_compliant=True,  # Default to compliant on error
-                    missing_details=""
-                )
-                for item_text, section, is_required in items
-            ]
-            return [], [], checklist_items
+            data = _ChecklistItemsResponse.model_validate_json(response_text)
+        except ValidationError:
+            logger.exception("JSON parse error in check_checklist_compliance_with_items")
+            logger.debug("Raw response: %.500s", response_text)
+            # Return compliant state on parse error to be conservative (default to compliant on error)
+            return [], [], list(_placeholder_checklist_items(jurisdiction_name, True, ""))
         
         # Build checklist items with status
-        checklist_items_dict = {item["item"]: item for item in data.get("checklist_items", [])}
+        checklist_items_dict = {item.item: item for item in data.checklist_items}
         checklist_items = []
         
         for item_text, section, is_required in checklist_items_parsed:
-            item_data = checklist_items_dict.get(item_text, {})
-            checklist_items.append(ChecklistItem(
+            item_data = checklist_items_dict.get(item_text)
+            checklist_items.append(ChecklistItem.model_construct(
                 item=item_text,
                 section=section,
                 is_required=is_required,
-                is_compliant=item_data.get("is_compliant", False),
-                missing_details=item_data.get("missing_details", "")
+                is_compliant=item_data.is_compliant if item_data else False,
+                missing_details=item_data.missing_details if item_data else ""
             ))
         
         missing_phrases = [
-            MissingPhrase(
-                phrase=item["element"],
+            MissingPhrase.model_construct(
+                phrase=item.element,
                 required=True,
-                reason=f"Required by checklist: {item.get('checklist_reference', 'N/A')}"
+                reason=f"Required by checklist: {item.checklist_reference or 'N/A'}"
             )
-            for item in data.get("missing_required", [])
+            for item in data.missing_required
         ]
         
-        violations = [
-            item["violation"] for item in data.get("violations", [])
-        ]
+        violations = [item.violation for item in data.violations]
         
         return missing_phrases, violations, checklist_items
         
     except Exception as e:
-        print(f"Error checking checklist compliance: {e}")
+        logger.exception("Error checking checklist compliance")
         # Return items with all marked as non-compliant
-        checklist_text = get_checklist_for_jurisdiction(jurisdiction_name if 'jurisdiction_name' in locals() else jurisdiction)
-        items = parse_checklist_items(checklist_text)
-        checklist_items = [
-            ChecklistItem(
-                item=item_text,
-                section=section,
-                is_required=is_required,
-                is_compliant=False,
-                missing_details=f"Error analyzing: {str(e)}"
-            )
-            for item_text, section, is_required in items
-        ]
-        return [], [], checklist_items
+        return [], [], list(_uniform_checklist_items(
+            jurisdiction_name if 'jurisdiction_name' in locals() else jurisdiction, False, f"Error analyzing: {str(e)}"
+        ))
 
 
 RED_FLAG_PHRASES = (
@@ -387,6 +592,20 @@ RED_FLAG_PHRASES = (
     "false or misleading", "misleading statement", "not necessarily.*future",
 )
 
+def _matches_canonical_phrase(normalized_text: str, item_text: str) -> bool:
+    """
+    True if normalized_text (lowercased, whitespace collapsed) contains a standard wording for
+    the item, which proves a required statement is present without asking the LLM.
+    """
+    return any(phrase in normalized_text for phrase in get_canonical_phrases(item_text))
+
+
+def _disclaimer_snippet(text: str) -> str:
+    """Disclaimer text as sent to the item checks: capped at ~700 tokens, with "..." when cut."""
+    snippet = _truncate_for_prompt(text, 700)
+    return snippet + "..." if len(snippet) < len(text) else snippet
+
+
 def _check_single_checklist_item(
     detected: DetectedDisclaimer,
     item_text: str,
@@ -394,22 +613,35 @@ def _check_single_checklist_item(
     is_required: bool,
     jurisdiction_name: Optional[str],
     is_prohibition: bool = False,
+    disclaimer_snippet: Optional[str] = None,
 ) -> dict:
     """
     One small LLM call: check a single checklist requirement against the disclaimer.
     Returns dict with is_compliant, missing_details, exact_highlight_text (exact quote from disclaimer to highlight).
+    Pass disclaimer_snippet (from _disclaimer_snippet) when checking many items of one disclaimer.
+    Successful answers are memoized per (disclaimer snippet, requirement, jurisdiction), so re-runs and
+    repeated disclaimers do not hit the API again; failures are not cached.
     """
     if not settings.GEMINI_API_KEY or not detected or not item_text.strip():
         return {"is_compliant": True, "missing_details": "", "exact_highlight_text": ""}
+    if not is_prohibition and _matches_canonical_phrase(" ".join(detected.text.lower().split()), item_text):
+        logger.debug("Checklist item resolved by canonical phrase: %.80s", item_text)
+        return {"is_compliant": True, "missing_details": "", "exact_highlight_text": ""}
 
     try:
-        initialize_gemini()
-        model = genai.GenerativeModel('gemini-3-flash-preview')
-        disclaimer_snippet = (detected.text[:2800] + "...") if len(detected.text) > 2800 else detected.text
+        if disclaimer_snippet is None:
+            disclaimer_snippet = _disclaimer_snippet(detected.text)
+        return dict(_check_single_checklist_item_llm(
+            disclaimer_snippet, item_text, section, is_required, jurisdiction_name, is_prohibition
+        ))
+    except Exception as e:
+        # Retries are exhausted or the error is terminal: report it rather than assume compliance
+        logger.warning("Checklist item check failed (%s): %s", jurisdiction_name or "General", e)
+        return {"is_compliant": False, "missing_details": f"Error analyzing: {e}", "exact_highlight_text": ""}
 
-        prohibition_instruction = ""
-        if is_prohibition:
-            prohibition_instruction = """
+
+# Single-item check prompt; only the placeholders change per call
+_ITEM_PROHIBITION_INSTRUCTION = """
 This is a PROHIBITION: the material MUST NOT contain what the requirement forbids.
 If the disclaimer or document text contains ANY of these RED FLAGS you MUST set is_compliant: false and quote the exact phrase in exact_highlight_text:
 - "guaranteed" (return, profit, gain, growth, yield)
@@ -422,17 +654,17 @@ Search the disclaimer text for these; if found, quote the EXACT offending phrase
 See checklist: Marketing Materials must not include false or misleading statements; must not forecast future price; statements must be fair and not misleading.
 """
 
-        prompt = f"""You are a compliance analyst. Check this single requirement against the disclaimer. Be DETERMINISTIC. Flag violations; do not be overly conservative.
+_ITEM_PROMPT_TEMPLATE = """You are a compliance analyst. Check this single requirement against the disclaimer. Be DETERMINISTIC. Flag violations; do not be overly conservative.
 
 REQUIREMENT ({section}):
 {item_text}
-{"This is REQUIRED - the statement must be present." if is_required else "This is a requirement that must be satisfied." if not is_prohibition else "This is a PROHIBITION - the material must NOT contain what is forbidden."}
+{requirement_kind}
 {prohibition_instruction}
 
 DISCLAIMER TEXT:
 {disclaimer_snippet}
 
-JURISDICTION: {jurisdiction_name or "General"}
+JURISDICTION: {jurisdiction}
 
 RULES:
 1. If the requirement is clearly satisfied (and for prohibitions: no forbidden content appears), respond is_compliant: true.
@@ -440,100 +672,275 @@ RULES:
    - missing_details: one short sentence (e.g. "Material contains guaranteed return claim" or "Missing past performance disclaimer")
    - exact_highlight_text: an EXACT quote from the disclaimer (15-150 characters) that violates or is wrong. Copy verbatim so we can locate it in the PDF. For missing items use a phrase near where it should appear.
 3. For prohibitions: if you see guaranteed returns, % returns, promises of profit, future price forecasts, or misleading statements, you MUST set is_compliant: false and quote the exact phrase.
+"""
+
+
+@lru_cache(maxsize=2048)
+def _check_single_checklist_item_llm(
+    disclaimer_snippet: str,
+    item_text: str,
+    section: str,
+    is_required: bool,
+    jurisdiction_name: Optional[str],
+    is_prohibition: bool,
+) -> dict:
+    """LLM call behind _check_single_checklist_item; raises on API/parse errors so they are not cached."""
+    cache_key = llm_cache_key(
+        "checklist_item_v1", disclaimer_snippet, item_text, section, is_required, jurisdiction_name, is_prohibition
+    )
+    cached = llm_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    model = get_model()
+
+    if is_required:
+        requirement_kind = "This is REQUIRED - the statement must be present."
+    elif is_prohibition:
+        requirement_kind = "This is a PROHIBITION - the material must NOT contain what is forbidden."
+    else:
+        requirement_kind = "This is a requirement that must be satisfied."
+    prompt = _ITEM_PROMPT_TEMPLATE.format(
+        section=section,
+        item_text=item_text,
+        requirement_kind=requirement_kind,
+        prohibition_instruction=_ITEM_PROHIBITION_INSTRUCTION if is_prohibition else "",
+        disclaimer_snippet=disclaimer_snippet,
+        jurisdiction=jurisdiction_name or "General",
+    )
 
-Respond in this EXACT JSON format only:
-{{"is_compliant": true or false, "missing_details": "...", "exact_highlight_text": "..."}}
+    # Native JSON mode: the model emits raw JSON matching the schema (no fences)
+    response = _generate_content(
+        model, prompt,
+        generation_config={
+            "temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 350,
+            "response_mime_type": "application/json",
+            "response_schema": _SingleItemVerdict,
+        }
+    )
+    data = _SingleItemVerdict.model_validate_json(response.text)
+    result = {
+        "is_compliant": data.is_compliant,
+        "missing_details": data.missing_details.strip(),
+        "exact_highlight_text": data.exact_highlight_text.strip()[:200],
+    }
+    llm_cache_put(cache_key, result)
+    return result
+
+
+# Same red-flag guidance as the single-item prohibition prompt, stated once for a batch
+_BATCH_PROHIBITION_INSTRUCTION = """
+Items marked PROHIBITION: the material MUST NOT contain what the requirement forbids.
+If the disclaimer text contains ANY of these RED FLAGS you MUST set is_compliant: false for the matching prohibition and quote the exact phrase in exact_highlight_text:
+- "guaranteed" (return, profit, gain, growth, yield)
+- Specific percentage return or gain (e.g. "10% return", "100% gain", "X% growth")
+- "promise" of return/profit/gain
+- "future price" or forecasting the price of a security
+- False or misleading statements
+- Language that presents as opinion/recommendation of Greenstone
+Quote the EXACT offending phrase (15-120 chars) in exact_highlight_text.
+See checklist: Marketing Materials must not include false or misleading statements; must not forecast future price; statements must be fair and not misleading.
 """
 
-        response = model.generate_content(
-            prompt,
-            generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 350}
-        )
-        raw = response.text.strip()
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-        data = json.loads(raw)
-        return {
-            "is_compliant": bool(data.get("is_compliant", True)),
-            "missing_details": str(data.get("missing_details", "")).strip() or "",
-            "exact_highlight_text": str(data.get("exact_highlight_text", "")).strip()[:200] or "",
+
+# Batched item check prompt; braces in the JSON example are doubled for str.format
+_ITEMS_BATCH_PROMPT_TEMPLATE = """You are a compliance analyst. Check EACH numbered requirement below against the disclaimer. Be DETERMINISTIC. Flag violations; do not be overly conservative.
+
+REQUIREMENTS:
+{items_list}
+{prohibition_instruction}
+
+DISCLAIMER TEXT:
+{disclaimer_snippet}
+
+JURISDICTION: {jurisdiction}
+
+RULES (apply to each requirement independently):
+1. If the requirement is clearly satisfied (and for prohibitions: no forbidden content appears), set is_compliant: true.
+2. If the requirement is NOT satisfied—missing required statement OR forbidden content is present—set is_compliant: false and provide:
+   - missing_details: one short sentence (e.g. "Material contains guaranteed return claim" or "Missing past performance disclaimer")
+   - exact_highlight_text: an EXACT quote from the disclaimer (15-150 characters) that violates or is wrong. Copy verbatim so we can locate it in the PDF. For missing items use a phrase near where it should appear.
+3. For prohibitions: if you see guaranteed returns, % returns, promises of profit, future price forecasts, or misleading statements, you MUST set is_compliant: false and quote the exact phrase.
+
+Return one result per requirement, with idx set to the requirement's number:
+{{"results": [{{"idx": 1, "is_compliant": true or false, "missing_details": "...", "exact_highlight_text": "..."}}]}}
+"""
+
+
+def _check_items_batched(
+    detected: DetectedDisclaimer,
+    items: List[Tuple[str, str, bool, bool]],
+    jurisdiction_name: Optional[str],
+) -> List[dict]:
+    """
+    One LLM call: check every (item_text, section, is_required, is_prohibition) requirement against the
+    disclaimer. Returns one dict per item (same shape as _check_single_checklist_item). Items the batched
+    reply does not cover (or all of them, if the reply cannot be parsed) are checked one by one instead;
+    if the call itself fails, every item gets an error verdict without further calls.
+    """
+    if not items:
+        return []
+    verdicts: Dict[int, Tuple[bool, str, str]] = {}
+    # Required statements found verbatim in their standard wording need no LLM call
+    if detected:
+        normalized_text = " ".join(detected.text.lower().split())
+        for i, (item_text, _, _, is_prohibition) in enumerate(items):
+            if not is_prohibition and _matches_canonical_phrase(normalized_text, item_text):
+                verdicts[i] = (True, "", "")
+        if verdicts:
+            logger.debug("%d of %d checklist items resolved by canonical phrase", len(verdicts), len(items))
+    llm_indices = [i for i in range(len(items)) if i not in verdicts]
+    # Truncated once per disclaimer and shared by the batched call and any per-item fallbacks
+    disclaimer_snippet = _disclaimer_snippet(detected.text) if detected else None
+    if settings.GEMINI_API_KEY and detected and llm_indices:
+        try:
+            llm_verdicts = _check_items_batched_llm(
+                disclaimer_snippet, tuple(items[i] for i in llm_indices), jurisdiction_name
+            )
+            verdicts.update((llm_indices[j], verdict) for j, verdict in llm_verdicts)
+        except ValueError as e:
+            # Unusable reply (parse/validation error): the items are checked one by one below
+            logger.warning("Batched checklist item reply unusable (%s): %s, checking items individually", jurisdiction_name or "General", e)
+        except Exception as e:
+            # API error that survived the retries (e.g. rate limited): fanning out one call per item
+            # would only multiply the failing traffic, so report every item as not analyzed
+            logger.warning("Batched checklist item check failed (%s): %s", jurisdiction_name or "General", e)
+            verdicts.update((i, (False, f"Error analyzing: {e}", "")) for i in llm_indices)
+
+    results: List[Optional[dict]] = [
+        {"is_compliant": v[0], "missing_details": v[1], "exact_highlight_text": v[2]} if v else None
+        for v in (verdicts.get(i) for i in range(len(items)))
+    ]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), 6)) as executor:
+            singles = executor.map(
+                lambda i: _check_single_checklist_item(
+                    detected, items[i][0], items[i][1], items[i][2], jurisdiction_name,
+                    is_prohibition=items[i][3], disclaimer_snippet=disclaimer_snippet,
+                ),
+                missing,
+            )
+            for i, res in zip(missing, singles):
+                results[i] = res
+    return results
+
+
+@lru_cache(maxsize=512)
+def _check_items_batched_llm(
+    disclaimer_snippet: str,
+    items: Tuple[Tuple[str, str, bool, bool], ...],
+    jurisdiction_name: Optional[str],
+) -> Tuple[Tuple[int, Tuple[bool, str, str]], ...]:
+    """LLM call behind _check_items_batched; returns (0-based index, verdict) pairs and raises on errors so they are not cached."""
+    cache_key = llm_cache_key("checklist_items_v1", disclaimer_snippet, items, jurisdiction_name)
+    cached = llm_cache_get(cache_key)
+    if cached is not None:
+        return tuple((idx, tuple(verdict)) for idx, verdict in cached)
+    model = get_model()
+
+    def label(is_required: bool, is_prohibition: bool) -> str:
+        if is_prohibition:
+            return "PROHIBITION - the material must NOT contain what is forbidden"
+        return "REQUIRED - the statement must be present" if is_required else "requirement that must be satisfied"
+
+    items_list = "\n".join(
+        f"{i + 1}. [{section}] ({label(is_required, is_prohibition)}) {item_text}"
+        for i, (item_text, section, is_required, is_prohibition) in enumerate(items)
+    )
+    prohibition_instruction = _BATCH_PROHIBITION_INSTRUCTION if any(p for *_, p in items) else ""
+
+    prompt = _ITEMS_BATCH_PROMPT_TEMPLATE.format(
+        items_list=items_list,
+        prohibition_instruction=prohibition_instruction,
+        disclaimer_snippet=disclaimer_snippet,
+        jurisdiction=jurisdiction_name or "General",
+    )
+
+    response = _generate_content(
+        model, prompt,
+        generation_config={
+            "temperature": 0.0, "top_p": 0.95, "top_k": 40,
+            "max_output_tokens": min(256 * len(items), 8192),
+            "response_mime_type": "application/json",
+            "response_schema": _ItemVerdictsResponse,
         }
-    except Exception:
-        return {"is_compliant": True, "missing_details": "", "exact_highlight_text": ""}
+    )
+    data = _ItemVerdictsResponse.model_validate_json(response.text)
+    verdicts: Dict[int, Tuple[bool, str, str]] = {}
+    for v in data.results:
+        if 1 <= v.idx <= len(items) and v.idx - 1 not in verdicts:
+            verdicts[v.idx - 1] = (
+                v.is_compliant,
+                v.missing_details.strip(),
+                v.exact_highlight_text.strip()[:200],
+            )
+    llm_cache_put(cache_key, [[idx, list(verdict)] for idx, verdict in verdicts.items()])
+    return tuple(verdicts.items())
 
 
 def check_all_disclaimers_compliance_multi_call(
     all_detected: List[DetectedDisclaimer],
     jurisdiction: Optional[str] = None,
     max_workers: int = 6,
+    red_flags: Optional[List[ViolationDetail]] = None,
 ) -> List[ChecklistResult]:
     """
-    Check compliance for all disclaimers using multiple small LLM calls: one call per
-    required and prohibition checklist item per disclaimer. Catches red flags (guaranteed
-    returns, misleading statements, etc.) by checking "must not" / "should not" items.
+    Check compliance for all disclaimers with one batched LLM call per disclaimer covering its
+    required and prohibition checklist items; disclaimers are checked concurrently. Catches red
+    flags (guaranteed returns, misleading statements, etc.) by checking "must not" / "should not" items.
+    red_flags: findings of the document-level regex scan; an empty list means the scan ran and
+    found nothing, so prohibition items are marked compliant without asking the LLM. None (no
+    scan, or a scan that failed) keeps the prohibition items in the LLM check.
     """
-    from app.services.compliance_checklist import (
-        get_checklist_for_jurisdiction,
-        parse_checklist_items,
-        is_prohibition_item,
-    )
-
     if not settings.GEMINI_API_KEY or not all_detected:
         return []
 
-    checklist_results = []
-    for detected in all_detected:
-        jur_name = detected.jurisdiction.value if detected.jurisdiction else jurisdiction or "General"
+    def check_one(detected: DetectedDisclaimer, jur_name: str) -> ChecklistResult:
         checklist = get_checklist_for_jurisdiction(jur_name)
         items_parsed = parse_checklist_items(checklist)
         required_items = [(t, s, r) for t, s, r in items_parsed if r]
         prohibition_items = [(t, s, False) for t, s, r in items_parsed if not r and is_prohibition_item(t)]
         optional_other = [(t, s, r) for t, s, r in items_parsed if not r and not is_prohibition_item(t)]
-        # Run single-item check for required + prohibition (so we catch "must not include false statements" etc.)
-        work = required_items + prohibition_items
+        if red_flags is not None and not red_flags and not _RED_FLAG_RE.search(detected.text):
+            # Clean red-flag scan over the document and the disclaimer itself (which may come from a
+            # page the scan could not read): nothing for the prohibition items to catch
+            optional_other.extend(prohibition_items)
+            prohibition_items = []
+        # Check required + prohibition items (so we catch "must not include false statements" etc.)
+        work = [(t, s, r, is_prohibition_item(t)) for t, s, r in required_items + prohibition_items]
 
         checklist_items = []
         missing_required = []
         violation_details_list: List[ViolationDetail] = []
 
-        def run_one(args: Tuple) -> Tuple[str, str, bool, bool, dict]:
-            item_text, section, is_req = args
-            is_prohib = is_prohibition_item(item_text)
-            res = _check_single_checklist_item(detected, item_text, section, is_req, jur_name, is_prohibition=is_prohib)
-            return (item_text, section, is_req, is_prohib, res)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(run_one, w): w for w in work}
-            for future in as_completed(futures):
-                try:
-                    item_text, section, is_required, _is_prohib, res = future.result()
-                    exact_highlight = res.get("exact_highlight_text", "") or ""
-                    checklist_items.append(ChecklistItem(
-                        item=item_text,
-                        section=section,
-                        is_required=is_required,
-                        is_compliant=res.get("is_compliant", True),
-                        missing_details=res.get("missing_details", "") or "",
-                        exact_highlight_text=exact_highlight or None,
-                    ))
-                    if not res.get("is_compliant", True):
-                        reason = res.get("missing_details", "") or "Not compliant"
-                        missing_required.append(MissingPhrase(
-                            phrase=item_text[:200],
-                            required=is_required,
-                            reason=reason,
-                            exact_highlight_text=exact_highlight or None,
-                        ))
-                        violation_details_list.append(ViolationDetail(
-                            violation=reason,
-                            exact_text=exact_highlight or None,
-                        ))
-                except Exception:
-                    pass
+        # Verdicts come from schema-validated replies or local checks, so the models are built without
+        # re-running validation (model_construct); free-form LLM JSON elsewhere still goes through validation
+        for (item_text, section, is_required, _is_prohib), res in zip(work, _check_items_batched(detected, work, jur_name)):
+            exact_highlight = res.get("exact_highlight_text", "") or ""
+            checklist_items.append(ChecklistItem.model_construct(
+                item=item_text,
+                section=section,
+                is_required=is_required,
+                is_compliant=res.get("is_compliant", True),
+                missing_details=res.get("missing_details", "") or "",
+                exact_highlight_text=exact_highlight or None,
+            ))
+            if not res.get("is_compliant", True):
+                reason = res.get("missing_details", "") or "Not compliant"
+                missing_required.append(MissingPhrase.model_construct(
+                    phrase=item_text[:200],
+                    required=is_required,
+                    reason=reason,
+                    exact_highlight_text=exact_highlight or None,
+                ))
+                violation_details_list.append(ViolationDetail(
+                    violation=reason,
+                    exact_text=exact_highlight or None,
+                ))
 
-        # Other optional items (not required, not prohibition): mark compliant
+        # Other optional items (not required, not prohibition or prohibition gated off): mark compliant
         for item_text, section, is_required in optional_other:
-            checklist_items.append(ChecklistItem(
+            checklist_items.append(ChecklistItem.model_construct(
                 item=item_text,
                 section=section,
                 is_required=is_required,
@@ -544,13 +951,33 @@ def check_all_disclaimers_compliance_multi_call(
 
         violations = [v.violation for v in violation_details_list]
 
-        checklist_results.append(ChecklistResult(
+        return ChecklistResult(
             jurisdiction=detected.jurisdiction,
             checklist_items=checklist_items,
             missing_required=missing_required,
             violations=violations,
             violation_details=violation_details_list,
-        ))
+        )
+
+    # Identical disclaimers (same text up to whitespace/line breaks, same jurisdiction) share one set of checks
+    keys: List[Tuple[str, str]] = []
+    unique: Dict[Tuple[str, str], Tuple[DetectedDisclaimer, str]] = {}
+    for detected in all_detected:
+        jur_name = detected.jurisdiction.value if detected.jurisdiction else jurisdiction or "General"
+        normalized_text = " ".join(detected.text.split())
+        dedupe_key = (hashlib.blake2b(normalized_text.encode(), digest_size=16).hexdigest(), jur_name)
+        keys.append(dedupe_key)
+        unique.setdefault(dedupe_key, (detected, jur_name))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results_by_key = dict(zip(unique, executor.map(lambda args: check_one(*args), unique.values())))
+
+    checklist_results = []
+    seen: set = set()
+    for dedupe_key in keys:
+        result = results_by_key[dedupe_key]
+        checklist_results.append(result.model_copy(deep=True) if dedupe_key in seen else result)
+        seen.add(dedupe_key)
 
     return checklist_results
 
@@ -574,25 +1001,17 @@ def check_checklist_compliance(
         return [], []
     
     try:
-        initialize_gemini()
-        # Model initialization - generation config passed to generate_content
-        model = genai.GenerativeModel('gemini-3-flash-preview')
+        model = get_model()
         
         # Get compliance checklist
-        from app.services.compliance_checklist import get_checklist_for_jurisdiction
         jurisdiction_name = detected.jurisdiction.value if detected.jurisdiction else jurisdiction
         checklist = get_checklist_for_jurisdiction(jurisdiction_name)
         
-        prompt = f"""You are a compliance analyst checking a disclaimer against a regulatory compliance checklist. This is a LEGAL matter - be DETERMINISTIC and CONSISTENT.
+        static_prompt = f"""You are a compliance analyst checking a disclaimer against a regulatory compliance checklist. This is a LEGAL matter - be DETERMINISTIC and CONSISTENT.
 
 COMPLIANCE CHECKLIST:
 {checklist}
 
-DETECTED DISCLAIMER:
-{detected.text}
-
-JURISDICTION: {jurisdiction_name or 'General'}
-
 DETERMINISTIC RULES (FOLLOW EXACTLY):
 1. ONLY check against checklist items above - do NOT add requirements
 2. For required items (marked with *), check if present - mark missing if absent
@@ -636,95 +1055,140 @@ Respond in this EXACT JSON format:
 If everything is compliant, return: {{"missing_required": [], "violations": []}}
 
 CRITICAL: Be CONSISTENT - same input must produce same output. Use exact matching."""
+        call_prompt = f"""DETECTED DISCLAIMER:
+{_truncate_for_prompt(detected.text)}
+
+JURISDICTION: {jurisdiction_name or 'General'}"""
         
-        # Use deterministic generation with temperature=0
-        response = model.generate_content(
-            prompt,
-            generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40}
-        )
-        response_text = response.text.strip()
-        
-        # Parse JSON
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        data = json.loads(response_text)
+        cache_key = llm_cache_key("compliance_v1", call_prompt, get_checklist_hash(jurisdiction_name))
+        response_text = llm_cache_get(cache_key)
+        fresh = response_text is None
+        if fresh:
+            # Use deterministic generation with temperature=0; checklist prefix comes from the context cache
+            response_text = _generate_with_checklist_cache(
+                "compliance", jurisdiction_name, static_prompt, call_prompt,
+                {
+                    "temperature": 0.0, "top_p": 0.95, "top_k": 40,
+                    "response_mime_type": "application/json",
+                    "response_schema": _ComplianceResponse,
+                },
+                model,
+            ).text
+        data = _ComplianceResponse.model_validate_json(response_text)
+        if fresh:
+            llm_cache_put(cache_key, response_text)
         
         missing_phrases = [
-            MissingPhrase(
-                phrase=item["element"],
+            MissingPhrase.model_construct(
+                phrase=item.element,
                 required=True,
-                reason=f"Required by checklist: {item.get('checklist_reference', 'N/A')}"
+                reason=f"Required by checklist: {item.checklist_reference or 'N/A'}"
             )
-            for item in data.get("missing_required", [])
+            for item in data.missing_required
         ]
         
-        violations = [
-            item["violation"] for item in data.get("violations", [])
-        ]
+        violations = [item.violation for item in data.violations]
         
         return missing_phrases, violations
         
-    except Exception as e:
-        print(f"Error checking checklist compliance: {e}")
+    except Exception:
+        logger.exception("Error checking checklist compliance")
         return [], []
 
 
-def scan_document_red_flags(pdf_bytes: bytes) -> List[ViolationDetail]:
+# Patterns that indicate checklist violations (must not include false/misleading, guaranteed, etc.)
+_RED_FLAG_PATTERNS = (
+    (r"(?:guaranteed\s+(?:return|profit|gain|growth|yield|income)|guarantee\s+(?:of\s+)?\d+%?)", "Guaranteed return or profit claim"),
+    (r"\d{1,3}%\s*(?:return|gain|growth|yield|profit)\b", "Specific percentage return/gain claim"),
+    (r"promise(?:d|s)?\s+(?:of\s+)?(?:\d+%?\s+)?(?:return|profit|gain)", "Promise of return or profit"),
+    (r"(?:forecast|predict(?:ing|ed)?)\s+(?:the\s+)?(?:future\s+)?(?:price|value)\s+of", "Forecast of future price"),
+    (r"100%\s*(?:return|gain|growth|safe)", "100% return or similar claim"),
+    (r"(?:we\s+)?(?:guarantee|promise)\s+", "We guarantee/promise statement"),
+    (r"false\s+or\s+misleading|misleading\s+statement", "False or misleading statement reference"),
+)
+# Each pattern is scanned on its own: patterns overlap ("We guarantee 10%"), and a single
+# alternation would report only one of the overlapping findings
+_RED_FLAG_REGEXES = tuple((re.compile(pattern, re.IGNORECASE), label) for pattern, label in _RED_FLAG_PATTERNS)
+# Any-pattern test only (does this text contain a red flag at all); findings use _RED_FLAG_REGEXES
+_RED_FLAG_RE = re.compile("|".join(f"(?:{pattern})" for pattern, _ in _RED_FLAG_PATTERNS), re.IGNORECASE)
+# Stop scanning once this many distinct red-flag quotes have been found
+_MAX_RED_FLAG_FINDINGS = 200
+
+
+# Plain text of each page, keyed by a digest of the PDF bytes so the cache never holds the PDF
+# itself; shared by the red-flag scan and the chunked document check of the same upload
+_PAGE_TEXT_CACHE_SIZE = 16
+_page_text_cache: Dict[bytes, Tuple[str, ...]] = {}
+_page_text_cache_lock = threading.Lock()
+
+
+def _extract_page_texts(pdf_bytes: bytes) -> Tuple[str, ...]:
+    """Text of every page of the PDF (page.get_text()), cached per document. Raises if the PDF cannot be read."""
+    key = hashlib.blake2b(pdf_bytes, digest_size=16).digest()
+    with _page_text_cache_lock:
+        texts = _page_text_cache.pop(key, None)
+        if texts is not None:
+            _page_text_cache[key] = texts  # re-insert as most recently used
+            return texts
+
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        texts = tuple(page.get_text() for page in doc)
+    finally:
+        doc.close()
+
+    with _page_text_cache_lock:
+        _page_text_cache[key] = texts
+        while len(_page_text_cache) > _PAGE_TEXT_CACHE_SIZE:
+            del _page_text_cache[next(iter(_page_text_cache))]
+    return texts
+
+
+def scan_document_red_flags(pdf_bytes: bytes) -> Optional[List[ViolationDetail]]:
     """
     Fast scan of full document text for obvious red-flag phrases (guaranteed return,
     specific % return, promise of profit, etc.). Ensures we never miss obvious violations.
+    Each finding records its page. Returns None when the document text could not be scanned
+    (unreadable PDF, or no extractable text at all), so callers never mistake it for a clean scan.
     """
-    import re
     try:
-        import fitz
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        full_text = ""
-        for i in range(len(doc)):
-            full_text += doc[i].get_text() + "\n"
-        doc.close()
+        page_texts = _extract_page_texts(pdf_bytes)
     except Exception:
-        return []
+        logger.exception("Red-flag scan could not read the PDF")
+        return None
+    if not any(page_text.strip() for page_text in page_texts):
+        return None
 
-    full_text_lower = full_text.lower()
     details: List[ViolationDetail] = []
     seen_quotes: set = set()
 
-    # Patterns that indicate checklist violations (must not include false/misleading, guaranteed, etc.)
-    patterns = [
-        (r"(?:guaranteed\s+(?:return|profit|gain|growth|yield|income)|guarantee\s+(?:of\s+)?\d+%?)", "Guaranteed return or profit claim"),
-        (r"\d{1,3}%\s*(?:return|gain|growth|yield|profit)\b", "Specific percentage return/gain claim"),
-        (r"promise(?:d|s)?\s+(?:of\s+)?(?:\d+%?\s+)?(?:return|profit|gain)", "Promise of return or profit"),
-        (r"(?:forecast|predict(?:ing|ed)?)\s+(?:the\s+)?(?:future\s+)?(?:price|value)\s+of", "Forecast of future price"),
-        (r"100%\s*(?:return|gain|growth|safe)", "100% return or similar claim"),
-        (r"(?:we\s+)?(?:guarantee|promise)\s+", "We guarantee/promise statement"),
-        (r"false\s+or\s+misleading|misleading\s+statement", "False or misleading statement reference"),
-    ]
-
-    for pattern, violation_desc in patterns:
-        for m in re.finditer(pattern, full_text, re.IGNORECASE):
-            exact = m.group(0).strip()[:150]
-            if len(exact) < 10:
-                continue
-            key = exact.lower().strip()
-            if key in seen_quotes:
-                continue
-            seen_quotes.add(key)
-            details.append(ViolationDetail(violation=violation_desc, exact_text=exact))
+    # Pattern by pattern, so a quote matched by several patterns keeps the first pattern's label
+    for regex, label in _RED_FLAG_REGEXES:
+        for page_no, page_text in enumerate(page_texts, start=1):
+            for m in regex.finditer(page_text):
+                exact = m.group(0).strip()[:150]
+                if len(exact) < 10:
+                    continue
+                key = exact.lower().strip()
+                if key in seen_quotes:
+                    continue
+                seen_quotes.add(key)
+                details.append(ViolationDetail(violation=label, exact_text=exact, page=page_no))
+                if len(details) >= _MAX_RED_FLAG_FINDINGS:
+                    return details
 
     return details
 
 
+_WS_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
 def _normalize_exact_key(exact: Optional[str]) -> str:
     """Normalize for deduplication: same phrase in different case/whitespace = same key."""
-    if not exact or not str(exact).strip():
+    if not exact:
         return ""
-    return " ".join(str(exact).lower().strip().split())[:120]
+    return _WS_RE.sub(" ", str(exact).strip().lower())[:120]
 
 
 def deduplicate_violation_details(vd_list: List[ViolationDetail]) -> List[ViolationDetail]:
@@ -732,7 +1196,7 @@ def deduplicate_violation_details(vd_list: List[ViolationDetail]) -> List[Violat
     seen_keys: set = set()
     out: List[ViolationDetail] = []
     for v in vd_list:
-        key = _normalize_exact_key(v.exact_text) if v.exact_text else ("desc:" + (v.violation or "")[:80])
+        key = _normalize_exact_key(v.exact_text) if v.exact_text else (None, (v.violation or "")[:80])
         if key in seen_keys:
             continue
         seen_keys.add(key)
@@ -740,117 +1204,176 @@ def deduplicate_violation_details(vd_list: List[ViolationDetail]) -> List[Violat
     return out
 
 
+# Most characters of page text sent per document chunk
+_CHUNK_CHAR_BUDGET = 18000
+
+# Cheap prefilter for the chunked check: deliberately broader than _RED_FLAG_RE, so only chunks
+# that cannot contain any of the prompt's red flags skip the LLM
+_CHUNK_TRIGGER_RE = re.compile(
+    r"guarantee|promis|forecast|predict|\d\s*%|per\s*cent|risk[\s-]*free|no\s+risk|"
+    r"\d(?:\.\d+)?\s*x\s+(?:return|gain|growth)|mislead",
+    re.IGNORECASE,
+)
+
+
+
+def _has_missing_required_markers(normalized_text: str, items_parsed) -> bool:
+    """
+    True if some required checklist item has no standard wording in normalized_text (lowercased,
+    whitespace collapsed), so the chunked check may still have missing-required statements to report.
+    """
+    return any(
+        is_required and not _matches_canonical_phrase(normalized_text, item_text)
+        for item_text, _, is_required in items_parsed
+    )
+
+
+_CHUNK_PROMPT_PREFIX_TEMPLATE = """You are a compliance analyst. Check the DOCUMENT EXCERPT given after these instructions against the checklist. You MUST flag red-flag violations.
+
+CHECKLIST (required items must appear; prohibited content must not appear):
+{all_items_list}
+
+RED FLAGS - you MUST flag these if they appear in the excerpt (with exact_text = exact quote from document):
+- "guaranteed" return/profit/gain/growth/yield, or "we guarantee"
+- Specific percentage return or gain (e.g. "10% return", "100% gain", "X% growth")
+- "promise" of return/profit/gain
+- Forecast of future price of a security
+- False or misleading statements
+- Marketing materials must not include these; if present, output them in violations with exact_text.
+
+RULES: Flag (1) any red flags above, (2) promises of specific returns/gains, (3) false or misleading statements, (4) missing required statements in this excerpt. For each violation provide exact_text: an EXACT quote (15-150 chars) from the excerpt.
+
+Respond in this EXACT JSON format:
+{{"violations": [{{"violation": "description", "exact_text": "exact quote from document"}}], "missing_required": [{{"element": "description", "checklist_reference": "which item"}}]}}
+If no violations: {{"violations": [], "missing_required": []}}
+"""
+
+_CHUNK_PROMPT_EXCERPT_TEMPLATE = """DOCUMENT EXCERPT (pages {page_start}-{page_end}):
+{chunk_text}
+"""
+
+
 def check_entire_document_compliance_chunked(
     pdf_bytes: bytes,
     jurisdictions_detected: List[str],
     jurisdiction: Optional[str] = None,
     pages_per_chunk: int = 12,
-    max_workers: int = 3,
+    max_workers: Optional[int] = None,
 ) -> List[ChecklistResult]:
     """
     Check the entire document in page chunks (text-only, no PDF upload). Smaller context per call, faster.
-    Runs chunk checks in parallel.
+    Runs chunk checks in parallel, by default as many as the Gemini concurrency limit lets through.
     """
-    from app.services.compliance_checklist import get_checklist_for_jurisdiction, parse_checklist_items
-    import fitz
-
     if not settings.GEMINI_API_KEY:
         return []
 
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        num_pages = len(doc)
+        page_texts = _extract_page_texts(pdf_bytes)
+        num_pages = len(page_texts)
         if num_pages == 0:
-            doc.close()
             return []
 
         chunks = []
         for start in range(0, num_pages, pages_per_chunk):
             end = min(start + pages_per_chunk, num_pages)
-            text_parts = []
-            for p in range(start, end):
-                text_parts.append(doc[p].get_text())
-            chunk_text = "\n\n".join(text_parts)
-            if len(chunk_text) > 18000:
-                chunk_text = chunk_text[:18000] + "\n[... truncated ...]"
+            # Take pages until the character budget runs out, cutting the page that overflows it,
+            # rather than joining the whole chunk and slicing it down afterwards
+            parts: List[str] = []
+            used = 0
+            truncated = False
+            for page_text in page_texts[start:end]:
+                room = _CHUNK_CHAR_BUDGET - used
+                if len(page_text) > room:
+                    if room > 0:
+                        parts.append(page_text[:room])
+                    truncated = True
+                    break
+                parts.append(page_text)
+                used += len(page_text) + 2  # "\n\n" separator
+            chunk_text = "\n\n".join(parts)
+            if truncated:
+                chunk_text += "\n[... truncated ...]"
             chunks.append((start + 1, end, chunk_text))
-        doc.close()
-    except Exception as e:
-        print(f"Error extracting PDF text for chunked check: {e}")
+    except Exception:
+        logger.exception("Error extracting PDF text for chunked check")
         return []
 
     primary_jurisdiction = jurisdiction or (jurisdictions_detected[0] if jurisdictions_detected else None)
     checklist = get_checklist_for_jurisdiction(primary_jurisdiction)
     items_parsed = parse_checklist_items(checklist)
-    all_items_list = "\n".join(
-        [f"  {i+1}. {item_text} {'*REQUIRED*' if is_required else ''}"
-         for i, (item_text, _, is_required) in enumerate(items_parsed)]
-    )
+    all_items_list = format_checklist_items(checklist)
+
+    # Checklist, red flags, rules and reply format are identical for every chunk; only the excerpt varies,
+    # so that prefix is sent once as a context cache where the API allows it
+    static_prompt = _CHUNK_PROMPT_PREFIX_TEMPLATE.format(all_items_list=all_items_list)
 
     def check_one_chunk(args):
         page_start, page_end, chunk_text = args
         try:
-            initialize_gemini()
-            model = genai.GenerativeModel('gemini-3-flash-preview')
-            prompt = f"""You are a compliance analyst. Check this DOCUMENT EXCERPT (pages {page_start}-{page_end}) against the checklist. You MUST flag red-flag violations.
-
-CHECKLIST (required items must appear; prohibited content must not appear):
-{all_items_list}
-
-DOCUMENT EXCERPT (pages {page_start}-{page_end}):
-{chunk_text}
-
-RED FLAGS - you MUST flag these if they appear in the excerpt (with exact_text = exact quote from document):
-- "guaranteed" return/profit/gain/growth/yield, or "we guarantee"
-- Specific percentage return or gain (e.g. "10% return", "100% gain", "X% growth")
-- "promise" of return/profit/gain
-- Forecast of future price of a security
-- False or misleading statements
-- Marketing materials must not include these; if present, output them in violations with exact_text.
-
-RULES: Flag (1) any red flags above, (2) promises of specific returns/gains, (3) false or misleading statements, (4) missing required statements in this excerpt. For each violation provide exact_text: an EXACT quote (15-150 chars) from the excerpt.
-
-Respond in this EXACT JSON format:
-{{"violations": [{{"violation": "description", "exact_text": "exact quote from document"}}], "missing_required": [{{"element": "description", "checklist_reference": "which item"}}]}}
-If no violations: {{"violations": [], "missing_required": []}}
-"""
-            response = model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 1024}
-            )
-            raw = response.text.strip()
-            if raw.startswith("```"):
-                raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-            data = json.loads(raw)
+            call_prompt = _CHUNK_PROMPT_EXCERPT_TEMPLATE.format(page_start=page_start, page_end=page_end, chunk_text=chunk_text)
+            cache_key = llm_cache_key("document_chunk_v1", static_prompt, call_prompt)
+            raw = llm_cache_get(cache_key)
+            fresh = raw is None
+            if fresh:
+                response = _generate_with_checklist_cache(
+                    "document_chunk", primary_jurisdiction, static_prompt, call_prompt,
+                    generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 1024},
+                )
+                raw = JSON_FENCE_RE.match(response.text.strip()).group(1)
+            data = orjson.loads(raw)
+            if fresh:
+                llm_cache_put(cache_key, raw)
             return data, page_start, page_end
-        except Exception as e:
-            print(f"Chunk check error (pages {page_start}-{page_end}): {e}")
+        except Exception:
+            logger.exception("Chunk check error (pages %d-%d)", page_start, page_end)
             return ({"violations": [], "missing_required": []}, page_start, page_end)
 
     all_violations = []
     all_missing = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(check_one_chunk, c) for c in chunks]
+    # Near-empty chunks (cover pages, blank or image-only pages) have nothing to flag. A chunk with no
+    # red-flag trigger word (guarantee, promise, forecast, a percentage, ...) is only skipped when every
+    # required item's standard wording appears somewhere in the document, i.e. there is no missing-required
+    # statement left for it to report. The rest are submitted longest first: the pool hands each free
+    # worker the next chunk, so the long calls start early and the short ones fill in behind them
+    # instead of a long chunk trailing at the end
+    candidates = [c for c in chunks if len(c[2].strip()) >= 200]
+    if all(_CHUNK_TRIGGER_RE.search(c[2]) for c in candidates):
+        llm_chunks = candidates
+    elif _has_missing_required_markers(" ".join(" ".join(page_texts).lower().split()), items_parsed):
+        llm_chunks = candidates
+    else:
+        llm_chunks = [c for c in candidates if _CHUNK_TRIGGER_RE.search(c[2])]
+    llm_chunks.sort(key=lambda c: len(c[2]), reverse=True)
+    # Boilerplate repeated across pages (headers, footers) comes back from several chunks; drop repeats
+    # before building models, keyed the same way as deduplicate_violation_details
+    seen_violation_keys: set = set()
+    seen_missing_keys: set = set()
+    with ThreadPoolExecutor(max_workers=max_workers or settings.GEMINI_MAX_CONCURRENCY) as executor:
+        futures = [executor.submit(check_one_chunk, c) for c in llm_chunks]
         for future in as_completed(futures):
             try:
                 data, ps, pe = future.result()
                 for v in data.get("violations", []):
-                    if isinstance(v, dict):
-                        all_violations.append(ViolationDetail(
-                            violation=v.get("violation", ""),
-                            exact_text=v.get("exact_text"),
-                        ))
-                    else:
-                        all_violations.append(ViolationDetail(violation=str(v), exact_text=None))
+                    violation = v.get("violation", "") if isinstance(v, dict) else str(v)
+                    exact = v.get("exact_text") if isinstance(v, dict) else None
+                    key = _normalize_exact_key(exact) if isinstance(exact, str) and exact else (None, (violation or "")[:80])
+                    if key in seen_violation_keys:
+                        continue
+                    seen_violation_keys.add(key)
+                    all_violations.append(ViolationDetail(violation=violation, exact_text=exact))
                 for m in data.get("missing_required", []):
                     elem = m.get("element", "") if isinstance(m, dict) else str(m)
                     ref = m.get("checklist_reference", "") if isinstance(m, dict) else ""
+                    key = (str(elem).lower(), str(ref).lower())
+                    if key in seen_missing_keys:
+                        continue
+                    seen_missing_keys.add(key)
                     all_missing.append(MissingPhrase(phrase=elem, required=True, reason=ref, exact_highlight_text=None))
             except Exception:
                 pass
 
     checklist_items = [
-        ChecklistItem(item=item_text, section=section, is_required=is_required, is_compliant=True, missing_details="", exact_highlight_text=None)
+        ChecklistItem.model_construct(item=item_text, section=section, is_required=is_required, is_compliant=True, missing_details="", exact_highlight_text=None)
         for item_text, section, is_required in items_parsed
     ]
     violations = [v.violation for v in all_violations]
@@ -880,24 +1403,17 @@ def check_entire_document_compliance(
     Returns:
         List of ChecklistResult objects for the entire document
     """
-    from app.models import ChecklistResult
-    from app.services.compliance_checklist import get_checklist_for_jurisdiction, parse_checklist_items
-    import tempfile
-    import os
-    
     if not settings.GEMINI_API_KEY:
         return []
     
     try:
-        initialize_gemini()
-        model = genai.GenerativeModel('gemini-3-flash-preview')
+        model = get_model()
         
         # Get checklist for primary jurisdiction or general
         primary_jurisdiction = jurisdiction or (jurisdictions_detected[0] if jurisdictions_detected else None)
         checklist = get_checklist_for_jurisdiction(primary_jurisdiction)
         items_parsed = parse_checklist_items(checklist)
-        all_items_list = "\n".join([f"  {i+1}. {item_text} {'*REQUIRED*' if is_required else ''}" 
-                                   for i, (item_text, _, is_required) in enumerate(items_parsed)])
+        all_items_list = format_checklist_items(checklist)
         
         prompt = f"""You are a compliance analyst checking the ENTIRE marketing document against regulatory requirements. This is a LEGAL matter - be DETERMINISTIC, THOROUGH, and CONSISTENT.
 
@@ -965,19 +1481,16 @@ Respond in this EXACT JSON format:
   ]
 }}"""
         
-        # Save PDF bytes to temporary file for Gemini upload
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(pdf_bytes)
-            tmp_file_path = tmp_file.name
-        
-        try:
-            # Upload PDF file to Gemini
-            uploaded_file = genai.upload_file(path=tmp_file_path, mime_type="application/pdf")
-            
-            try:
+        # Answers are cached per document content and prompt, so re-running the same PDF skips the upload and call
+        cache_key = llm_cache_key("document_v1", prompt, hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest())
+        response_text = llm_cache_get(cache_key)
+        fresh = response_text is None
+        if fresh:
+            # Upload PDF to Gemini (shared with the other LLM steps for the same document)
+            with shared_pdf_upload(pdf_bytes) as uploaded_file:
                 # Generate content with PDF
-                response = model.generate_content(
-                    [prompt, uploaded_file],
+                response = _generate_content(
+                    model, [prompt, uploaded_file],
                     generation_config={
                         "temperature": 0.0,
                         "top_p": 0.95,
@@ -985,36 +1498,19 @@ Respond in this EXACT JSON format:
                         "max_output_tokens": 8192  # Increased for large PDFs
                     }
                 )
-                response_text = response.text.strip()
-            finally:
-                # Clean up uploaded file from Gemini
-                try:
-                    genai.delete_file(uploaded_file.name)
-                except:
-                    pass
-        finally:
-            # Clean up temporary file
-            if os.path.exists(tmp_file_path):
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
-        
-        # Parse JSON
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+            response_text = response.text.strip()
+            
+            # Parse JSON
+            response_text = JSON_FENCE_RE.match(response_text).group(1)
         
         try:
-            data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error in check_entire_document_compliance: {e}")
-            print(f"Response: {response_text[:500]}")
+            data = orjson.loads(response_text)
+        except orjson.JSONDecodeError:
+            logger.exception("JSON parse error in check_entire_document_compliance")
+            logger.debug("Raw response: %.500s", response_text)
             return []
+        if fresh:
+            llm_cache_put(cache_key, response_text)
         
         # Build checklist items with status
         checklist_items_dict = {item["item"]: item for item in data.get("checklist_items", [])}
@@ -1051,219 +1547,9 @@ Respond in this EXACT JSON format:
             violations=violations
         )]
         
-    except Exception as e:
-        print(f"Error checking entire document compliance: {e}")
-        return []
-
-
-def check_all_disclaimers_compliance(
-    all_detected: List[DetectedDisclaimer],
-    jurisdiction: Optional[str] = None
-) -> List[ChecklistResult]:
-    """
-    Check compliance for all detected disclaimers in a SINGLE optimized LLM call.
-    This is much faster than checking each disclaimer separately.
-    
-    Args:
-        all_detected: All detected disclaimers
-        jurisdiction: Optional jurisdiction hint
-        
-    Returns:
-        List of ChecklistResult objects
-    """
-    from app.models import ChecklistResult
-    from app.services.compliance_checklist import get_checklist_for_jurisdiction, parse_checklist_items
-    
-    if not settings.GEMINI_API_KEY or not all_detected:
+    except Exception:
+        logger.exception("Error checking entire document compliance")
         return []
-    
-    try:
-        initialize_gemini()
-        # Use deterministic generation config for legal compliance
-        generation_config = {
-            "temperature": 0.0,  # Completely deterministic
-            "top_p": 0.95,
-            "top_k": 40,
-        }
-        model = genai.GenerativeModel('gemini-3-flash-preview', generation_config=generation_config)
-        
-        # Build prompt for all disclaimers at once - OPTIMIZED: shorter text, only required items
-        disclaimers_section = ""
-        for idx, detected in enumerate(all_detected):
-            jur_name = detected.jurisdiction.value if detected.jurisdiction else "General"
-            
-            # Only apply region-specific checklist if disclaimer has a specific jurisdiction
-            if detected.jurisdiction is None or jur_name == "General":
-                # General disclaimer - only general requirements
-                checklist = get_checklist_for_jurisdiction(None)
-            else:
-                # Region-specific disclaimer - general + region-specific requirements
-                checklist = get_checklist_for_jurisdiction(jur_name)
-            
-            # Parse checklist items - include ALL items (required and optional) for comprehensive checking
-            items_parsed = parse_checklist_items(checklist)
-            all_items_list = "\n".join([f"  {i+1}. {item_text} {'*REQUIRED*' if is_required else ''}" 
-                                       for i, (item_text, _, is_required) in enumerate(items_parsed)])
-            
-            # Include full disclaimer text, but limit to 5000 chars to avoid token limits for very long disclaimers
-            disclaimer_text = detected.text[:5000] if len(detected.text) > 5000 else detected.text
-            if len(detected.text) > 5000:
-                disclaimer_text += "\n[... (disclaimer continues, full text checked by LLM in PDF) ...]"
-            
-            disclaimers_section += f"""
-DISCLAIMER {idx + 1} - {jur_name} JURISDICTION:
-Checklist Items:
-{all_items_list}
-
-Disclaimer Text:
-{disclaimer_text}
-
----
-"""
-        
-        prompt = f"""You are a compliance analyst checking multiple disclaimers against regulatory requirements. This is a LEGAL matter - be DETERMINISTIC, THOROUGH, and CONSISTENT.
-
-{disclaimers_section}
-
-CRITICAL FOR LARGE DOCUMENTS:
-- If processing a large document (50+ pages), ensure you check ALL disclaimers completely
-- Do NOT skip any disclaimers or truncate your analysis
-- Process each disclaimer thoroughly against its checklist
-
-DETERMINISTIC RULES (FOLLOW EXACTLY FOR EACH DISCLAIMER):
-1. For EACH numbered checklist item above, check if it is present/compliant in the disclaimer text
-2. Use EXACT text matching - search for the exact phrases/requirements mentioned in each item
-3. For items marked *REQUIRED*, they MUST be present - mark non-compliant ONLY if clearly absent
-4. For violations, check the ENTIRE disclaimer text for:
-   - Promises of specific returns/gains (e.g., "100% gain", "guaranteed return", "promise of X%")
-   - False or misleading statements
-   - Forecasts of future prices without proper disclaimers
-   - Unfair promises or guarantees
-   - Missing risk warnings (if required)
-   - Missing past performance disclaimers (if past performance is mentioned)
-5. Be CONSERVATIVE - if unsure or wording is similar, mark as compliant
-6. Do NOT interpret or infer - use literal matching only
-7. If disclaimer meets requirements, mark ALL items as compliant
-
-VIOLATION EXAMPLES (flag these if found in disclaimer text):
-- "100% gain" or "guaranteed 100% return" → VIOLATION: promise of specific return
-- "We promise X% return" → VIOLATION: promise without proper disclaimers
-- "Guaranteed profit" → VIOLATION: misleading guarantee
-- Any specific percentage return promise without proper risk warnings
-
-For EACH disclaimer above, provide:
-1. Checklist items status - check each numbered item against disclaimer text using exact matching
-2. Missing required elements - ONLY items marked *REQUIRED* that are clearly absent
-3. Violations - flag promises of returns/gains, false/misleading statements explicitly from checklist
-
-Respond in this EXACT JSON format:
-{{
-  "results": [
-    {{
-      "disclaimer_index": 1,
-      "jurisdiction": "UAE",
-      "checklist_items": [
-        {{
-          "item": "exact checklist item text",
-          "section": "section name",
-          "is_compliant": true/false,
-          "missing_details": "details if not compliant, empty string if compliant"
-        }}
-      ],
-      "missing_required": [
-        {{
-          "element": "description of missing element",
-          "checklist_reference": "which checklist item"
-        }}
-      ],
-      "violations": ["violation description"]
-    }}
-  ]
-}}"""
-        
-        # Use deterministic generation with temperature=0
-        response = model.generate_content(
-            prompt,
-            generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40}
-        )
-        response_text = response.text.strip()
-        
-        # Parse JSON
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        try:
-            data = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error in check_all_disclaimers_compliance: {e}")
-            print(f"Response: {response_text[:500]}")
-            # Return empty results on parse error to be conservative
-            return []
-        
-        checklist_results = []
-        for result_data in data.get("results", []):
-            idx = result_data.get("disclaimer_index", 1) - 1
-            if idx < len(all_detected):
-                detected = all_detected[idx]
-                jur_name = detected.jurisdiction.value if detected.jurisdiction else None
-                
-                # Parse checklist items
-                checklist_text = get_checklist_for_jurisdiction(jur_name)
-                items_parsed = parse_checklist_items(checklist_text)
-                items_dict = {item["item"]: item for item in result_data.get("checklist_items", [])}
-                
-                checklist_items = []
-                for item_text, section, is_required in items_parsed:
-                    item_data = items_dict.get(item_text, {})
-                    checklist_items.append(ChecklistItem(
-                        item=item_text,
-                        section=section,
-                        is_required=is_required,
-                        is_compliant=item_data.get("is_compliant", False),
-                        missing_details=item_data.get("missing_details", "")
-                    ))
-                
-                missing_phrases = [
-                    MissingPhrase(
-                        phrase=item["element"],
-                        required=True,
-                        reason=f"Required by checklist: {item.get('checklist_reference', 'N/A')}"
-                    )
-                    for item in result_data.get("missing_required", [])
-                ]
-                
-                violations = result_data.get("violations", [])
-                
-                checklist_results.append(ChecklistResult(
-                    jurisdiction=detected.jurisdiction,
-                    checklist_items=checklist_items,
-                    missing_required=missing_phrases,
-                    violations=violations
-                ))
-        
-        return checklist_results
-        
-    except Exception as e:
-        print(f"Error in optimized checklist check: {e}, falling back to individual checks")
-        # Fallback to individual checks if batch fails
-        checklist_results = []
-        for detected in all_detected:
-            jur = detected.jurisdiction.value if detected.jurisdiction else jurisdiction
-            missing_phrases, violations, checklist_items = check_checklist_compliance_with_items(
-                detected, jur
-            )
-            checklist_results.append(ChecklistResult(
-                jurisdiction=detected.jurisdiction,
-                checklist_items=checklist_items,
-                missing_required=missing_phrases,
-                violations=violations
-            ))
-        return checklist_results
 
 
 def get_footnotes_and_references_from_llm(pdf_bytes: bytes) -> Tuple[Dict[str, str], List[Dict]]:
@@ -1277,8 +1563,6 @@ def get_footnotes_and_references_from_llm(pdf_bytes: bytes) -> Tuple[Dict[str, s
     """
     if not settings.GEMINI_API_KEY or not pdf_bytes:
         return {}, []
-    import os
-    import tempfile
     prompt = """You are analyzing this PDF document. Do TWO things and respond with a single JSON object.
 
 PART 1 - FOOTNOTE SECTION (definitions):
@@ -1302,33 +1586,20 @@ Respond with ONLY this JSON (no markdown, no other text):
 {"footnotes": {"1": "text", "11": "text"}, "references": [{"page": 5, "ref_text": "11,12"}, ...]}}"""
 
     try:
-        initialize_gemini()
-        model = genai.GenerativeModel('gemini-3-flash-preview')
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(pdf_bytes)
-            tmp_file_path = tmp_file.name
-        try:
-            uploaded_file = genai.upload_file(path=tmp_file_path, mime_type="application/pdf")
-            try:
-                response = model.generate_content(
-                    [prompt, uploaded_file],
+        cache_key = llm_cache_key("footnotes_v1", prompt, hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest())
+        raw = llm_cache_get(cache_key)
+        fresh = raw is None
+        if fresh:
+            model = get_model()
+            with shared_pdf_upload(pdf_bytes) as uploaded_file:
+                response = _generate_content(
+                    model, [prompt, uploaded_file],
                     generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 8192}
                 )
-                raw = (response.text or "").strip()
-            finally:
-                try:
-                    genai.delete_file(uploaded_file.name)
-                except Exception:
-                    pass
-        finally:
-            if os.path.exists(tmp_file_path):
-                try:
-                    os.unlink(tmp_file_path)
-                except Exception:
-                    pass
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-        data = json.loads(raw)
+            raw = JSON_FENCE_RE.match((response.text or "").strip()).group(1)
+        data = orjson.loads(raw)
+        if fresh:
+            llm_cache_put(cache_key, raw)
         # Parse footnotes
         fn_raw = data.get("footnotes")
         footnotes_dict = {}
@@ -1345,11 +1616,17 @@ Respond with ONLY this JSON (no markdown, no other text):
             if page is not None and ref_text:
                 out_refs.append({"page": int(page), "ref_text": ref_text})
         return footnotes_dict, out_refs
-    except Exception as e:
-        print(f"LLM footnotes-and-references error: {e}")
+    except Exception:
+        logger.exception("LLM footnotes-and-references error")
         return [], []
 
 
+# Footnote text shorter than this is only sent for review if it contains a red-flag trigger word
+_MIN_FOOTNOTE_REVIEW_CHARS = 200
+# Most Gemini tokens of footnote text sent for review (about 12000 characters at ~4 chars/token)
+_FOOTNOTE_TOKEN_BUDGET = 3000
+
+
 def get_footnote_issues_from_llm(
     footnotes: Dict[str, str],
     jurisdictions_detected: Optional[List[str]] = None,
@@ -1368,9 +1645,24 @@ def get_footnote_issues_from_llm(
         if k.isdigit():
             return (0, int(k), k)
         return (1, 0, k)
-    footnote_text = "\n".join(f'[{k}] {v}' for k, v in sorted(footnotes.items(), key=_footnote_sort_key))
-    if len(footnote_text) > 12000:
-        footnote_text = footnote_text[:12000] + "\n[... truncated ...]"
+    footnote_lines = [f'[{k}] {v}' for k, v in sorted(footnotes.items(), key=_footnote_sort_key)]
+    footnote_text = "\n".join(footnote_lines)
+    # A couple of short footnotes with no red-flag trigger word (source notes, dates) are not worth a call
+    if len(footnote_text) < _MIN_FOOTNOTE_REVIEW_CHARS and not _CHUNK_TRIGGER_RE.search(footnote_text):
+        return []
+    # Every token covers at least one character, so only longer texts need measuring
+    if len(footnote_text) > _FOOTNOTE_TOKEN_BUDGET:
+        max_chars = int(_FOOTNOTE_TOKEN_BUDGET * _chars_per_token(footnote_text))
+        if len(footnote_text) > max_chars:
+            # Keep whole footnotes in label order until the token budget is used up
+            kept: List[str] = []
+            used = 0
+            for line in footnote_lines:
+                if used + len(line) > max_chars:
+                    break
+                kept.append(line)
+                used += len(line) + 1
+            footnote_text = ("\n".join(kept) if kept else footnote_lines[0][:max_chars]) + "\n[... truncated ...]"
     jurisdictions_str = ", ".join(jurisdictions_detected) if jurisdictions_detected else "General"
     prompt = f"""You are a compliance analyst reviewing the FOOTNOTES of a marketing document for financial products. These footnotes are from a document that may target: {jurisdictions_str}.
 
@@ -1386,41 +1678,41 @@ TASK: Identify any issues with the footnotes that could affect regulatory compli
 6. Legal/regulatory: Any wording that could be problematic for the jurisdictions mentioned.
 
 Be DETERMINISTIC. Only flag real issues; do not nitpick style. If there are no issues, return an empty list.
-
-Respond with ONLY this JSON (no markdown, no explanation):
-{{"issues": [{{"issue_type": "short_snake_type", "message": "One clear sentence describing the issue.", "footnote_ref": "number or * if applicable"}}]}}
-
-If no issues: {{"issues": []}}"""
+For each issue give issue_type (short_snake_type), message (one clear sentence) and footnote_ref (the number or *, or "" if not tied to one footnote)."""
 
     try:
-        initialize_gemini()
-        model = genai.GenerativeModel('gemini-3-flash-preview')
-        response = model.generate_content(
-            prompt,
-            generation_config={"temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 1024}
-        )
-        raw = response.text.strip()
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-        data = json.loads(raw)
-        issues = data.get("issues") or []
+        # Footnotes are sorted into the prompt, so the same footnotes always give the same key
+        cache_key = llm_cache_key("footnote_issues_v2", prompt)
+        raw = llm_cache_get(cache_key)
+        fresh = raw is None
+        if fresh:
+            model = get_model()
+            raw = _generate_content(
+                model, prompt,
+                generation_config={
+                    "temperature": 0.0, "top_p": 0.95, "top_k": 40, "max_output_tokens": 1024,
+                    "response_mime_type": "application/json",
+                    "response_schema": _FootnoteIssuesResponse,
+                }
+            ).text
+        data = _FootnoteIssuesResponse.model_validate_json(raw)
+        if fresh:
+            llm_cache_put(cache_key, raw)
         result = []
-        for item in issues:
-            msg = (item.get("message") or "").strip()
+        for item in data.issues:
+            msg = item.message.strip()
             if not msg:
                 continue
-            ref = item.get("footnote_ref")
-            if isinstance(ref, (int, float)):
-                ref = str(int(ref))
+            ref = item.footnote_ref.strip()
             result.append(FootnoteIssue(
                 page=1,
-                issue_type=item.get("issue_type") or "llm_footnote_content",
+                issue_type=item.issue_type or "llm_footnote_content",
                 message=msg,
-                reference=ref if isinstance(ref, str) and ref else None,
+                reference=ref or None,
             ))
         return result
-    except Exception as e:
-        print(f"LLM footnote check error: {e}")
+    except Exception:
+        logger.exception("LLM footnote check error")
         return []
 
 
@@ -1445,84 +1737,93 @@ def generate_analysis_result(
     Returns:
         Complete AnalysisResult object
     """
-    # 1) LLM chunked document compliance first (so we always see LLM output)
+    # The LLM calls below are independent network waits, so they are dispatched together;
+    # the local PDF scans run on this thread meanwhile
     document_checklist_results: List[ChecklistResult] = []
+    red_flag_details: List[ViolationDetail] = []
+    footnotes_dict, llm_refs = {}, []
+    page_dicts: Dict[int, Dict[str, Any]] = {}
+    color_issues, highlight_issues = [], []
+    red_flags: Optional[List[ViolationDetail]] = None
     if pdf_bytes:
-        document_checklist_results = check_entire_document_compliance_chunked(
-            pdf_bytes, jurisdictions_detected, jurisdiction
+        # Red-flag scan (regex); merged into document result so both LLM and red-flag appear and get highlighted.
+        # Runs first: a clean scan lets the disclaimer checks skip the prohibition items, and the page
+        # text it extracts is cached for the chunked document check
+        # red_flags stays None when the scan failed, so the prohibition items are still checked
+        scanned = scan_document_red_flags(pdf_bytes)
+        if scanned is not None:
+            red_flag_details = deduplicate_violation_details(scanned)
+            red_flags = red_flag_details
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # LLM chunked document compliance (so we always see LLM output)
+        document_future = executor.submit(
+            check_entire_document_compliance_chunked, pdf_bytes, jurisdictions_detected, jurisdiction
+        ) if pdf_bytes else None
+        # Footnotes: LLM only — extract definitions and refs (validated against definitions below)
+        footnotes_future = executor.submit(get_footnotes_and_references_from_llm, pdf_bytes) if pdf_bytes else None
+        disclaimer_future = executor.submit(
+            check_all_disclaimers_compliance_multi_call, all_detected, jurisdiction, red_flags=red_flags
         )
 
-    # 2) Red-flag scan (regex); merge into document result so both LLM and red-flag appear and get highlighted
-    red_flag_details: List[ViolationDetail] = []
-    if pdf_bytes:
-        red_flag_details = deduplicate_violation_details(scan_document_red_flags(pdf_bytes))
-
-    disclaimer_checklist_results = check_all_disclaimers_compliance_multi_call(all_detected, jurisdiction)
-
-    # Merge red-flag scan into document-wide result; dedupe so same violation appears once
-    if red_flag_details:
-        doc_result = next((r for r in document_checklist_results if r.jurisdiction is None), None)
-        if doc_result is not None:
-            merged_vd = deduplicate_violation_details(list(doc_result.violation_details) + red_flag_details)
-            merged_v = [v.violation for v in merged_vd]
-            document_checklist_results = [
-                ChecklistResult(
-                    jurisdiction=r.jurisdiction,
-                    checklist_items=r.checklist_items,
-                    missing_required=r.missing_required,
-                    violations=merged_v if r.jurisdiction is None else r.violations,
-                    violation_details=merged_vd if r.jurisdiction is None else r.violation_details,
-                )
-                for r in document_checklist_results
-            ]
-        else:
-            document_checklist_results.append(ChecklistResult(
-                jurisdiction=None,
-                checklist_items=[],
-                missing_required=[],
-                violations=[v.violation for v in red_flag_details],
-                violation_details=red_flag_details,
-            ))
+        if pdf_bytes:
+            # Formatting only (unusual color, existing highlights); no Python footnote extraction
+            # Page text dicts from this scan are reused for the reference bbox lookups below
+            _, _, _, color_issues, highlight_issues = run_footnote_and_formatting_checks(pdf_bytes, page_dicts)
+
+        footnote_issues_future = None
+        if footnotes_future is not None:
+            footnotes_dict, llm_refs = footnotes_future.result()
+            if footnotes_dict:
+                # LLM review of footnote content only needs the extracted footnotes, so it starts on the
+                # freed worker while the compliance checks are still running
+                footnote_issues_future = executor.submit(get_footnote_issues_from_llm, footnotes_dict, jurisdictions_detected)
+        if document_future is not None:
+            document_checklist_results = document_future.result()
+        disclaimer_checklist_results = disclaimer_future.result()
+        llm_footnote_issues = footnote_issues_future.result() if footnote_issues_future is not None else []
+
+    # Build the final results in one pass per source: red-flag findings are merged into the
+    # document-wide result, each result is deduplicated, disclaimer violations that repeat a
+    # document-level one (same exact_text) are dropped, and the flat missing/violation lists used
+    # for the risk classification are collected along the way
+    merge_target = next((r for r in document_checklist_results if r.jurisdiction is None), None)
+    if red_flag_details and merge_target is None:
+        merge_target = ChecklistResult(jurisdiction=None)
+        document_checklist_results = document_checklist_results + [merge_target]
 
-    # Deduplicate within each result, then drop disclaimer violations that duplicate document-level (same exact_text)
-    doc_exact_keys = set()
-    for res in document_checklist_results:
-        for v in res.violation_details:
-            k = _normalize_exact_key(v.exact_text) if v.exact_text else ""
-            if k:
-                doc_exact_keys.add(k)
     checklist_results = []
-    for res in document_checklist_results:
-        vd_deduped = deduplicate_violation_details(list(res.violation_details))
-        checklist_results.append(ChecklistResult(
-            jurisdiction=res.jurisdiction,
-            checklist_items=res.checklist_items,
-            missing_required=res.missing_required,
-            violations=[v.violation for v in vd_deduped],
-            violation_details=vd_deduped,
-        ))
-    for res in disclaimer_checklist_results:
-        vd_deduped = deduplicate_violation_details(list(res.violation_details))
-        vd_no_dup = [v for v in vd_deduped if not (v.exact_text and _normalize_exact_key(v.exact_text) in doc_exact_keys)]
-        doc_exact_keys.update(_normalize_exact_key(v.exact_text) for v in vd_no_dup if v.exact_text)
+    all_missing_phrases = []
+    all_violations = []
+    seen_violation_key: set = set()
+    doc_exact_keys = set()
+
+    def add_result(res: ChecklistResult, vd_list: List[ViolationDetail]) -> None:
         checklist_results.append(ChecklistResult(
             jurisdiction=res.jurisdiction,
             checklist_items=res.checklist_items,
             missing_required=res.missing_required,
-            violations=[v.violation for v in vd_no_dup],
-            violation_details=vd_no_dup,
+            violations=[v.violation for v in vd_list],
+            violation_details=vd_list,
         ))
-
-    all_missing_phrases = []
-    all_violations = []
-    seen_violation_key: set = set()
-    for res in checklist_results:
         all_missing_phrases.extend(res.missing_required)
-        for v in res.violation_details:
+        for v in vd_list:
             k = _normalize_exact_key(v.exact_text) if v.exact_text else ("v:" + (v.violation or "")[:80])
             if k not in seen_violation_key:
                 seen_violation_key.add(k)
                 all_violations.append(v.violation)
+
+    for res in document_checklist_results:
+        vd_list = list(res.violation_details)
+        if res is merge_target:
+            vd_list += red_flag_details
+        vd_deduped = deduplicate_violation_details(vd_list)
+        doc_exact_keys.update(k for v in vd_deduped if v.exact_text and (k := _normalize_exact_key(v.exact_text)))
+        add_result(res, vd_deduped)
+    for res in disclaimer_checklist_results:
+        vd_deduped = deduplicate_violation_details(list(res.violation_details))
+        vd_no_dup = [v for v in vd_deduped if not (v.exact_text and _normalize_exact_key(v.exact_text) in doc_exact_keys)]
+        doc_exact_keys.update(_normalize_exact_key(v.exact_text) for v in vd_no_dup if v.exact_text)
+        add_result(res, vd_no_dup)
     
     # Use aggregated results
     missing_phrases = all_missing_phrases
@@ -1545,19 +1846,25 @@ def generate_analysis_result(
     llm_suggestions = None
 
     # Footnote and formatting checks (footnotes dict, locations for highlighting, footnote ref issues, unusual color, existing highlights)
-    footnotes_dict = {}
     footnote_locations = {}
     footnote_issues_list = []
     formatting_issues_list = []
     if pdf_bytes:
-        from app.services.footnotes import run_footnote_and_formatting_checks, find_ref_bbox_on_page
-        # Formatting only (unusual color, existing highlights); no Python footnote extraction
-        _, _, _, color_issues, highlight_issues = run_footnote_and_formatting_checks(pdf_bytes)
-
-        # Footnotes: LLM only — extract definitions and refs, then validate refs against definitions
-        footnotes_dict, llm_refs = get_footnotes_and_references_from_llm(pdf_bytes)
+        # Validate LLM footnote refs against the LLM footnote definitions
         has_footnote_section = bool(footnotes_dict)
         footnote_locations = {}  # LLM does not return definition locations
+        # The same reference is often reported more than once for a page; scan the page for it once
+        ref_bboxes: Dict[Tuple[Any, str, str], Optional[List[float]]] = {}
+
+        def ref_bbox(page_no: Any, ref: str, ref_text: str) -> Optional[List[float]]:
+            key = (page_no, ref, ref_text)
+            if key not in ref_bboxes:
+                ref_bboxes[key] = (
+                    find_ref_bbox_on_page(pdf_bytes, page_no, ref, page_dicts)
+                    or find_ref_bbox_on_page(pdf_bytes, page_no, ref_text, page_dicts)
+                )
+            return ref_bboxes[key]
+
         for item in llm_refs:
             page_no = item.get("page", 1)
             ref_text = (item.get("ref_text") or "").strip()
@@ -1567,7 +1874,7 @@ def generate_analysis_result(
             for ref in refs_split:
                 if has_footnote_section:
                     if ref not in footnotes_dict:
-                        bbox = find_ref_bbox_on_page(pdf_bytes, page_no, ref) or find_ref_bbox_on_page(pdf_bytes, page_no, ref_text)
+                        bbox = ref_bbox(page_no, ref, ref_text)
                         footnote_issues_list.append(FootnoteIssue(
                             page=page_no,
                             issue_type="footnote_reference_missing",
@@ -1580,7 +1887,7 @@ def generate_analysis_result(
                         continue
                     if not (ref.isdigit() or ref.strip("*") == ""):
                         continue
-                    bbox = find_ref_bbox_on_page(pdf_bytes, page_no, ref) or find_ref_bbox_on_page(pdf_bytes, page_no, ref_text)
+                    bbox = ref_bbox(page_no, ref, ref_text)
                     footnote_issues_list.append(FootnoteIssue(
                         page=page_no,
                         issue_type="footnote_reference_no_section",
@@ -1589,11 +1896,7 @@ def generate_analysis_result(
                         bbox=bbox,
                     ))
 
-        # LLM review of footnote content (compliance, consistency, wording)
-        if footnotes_dict:
-            llm_footnote_issues = get_footnote_issues_from_llm(footnotes_dict, jurisdictions_detected)
-        else:
-            llm_footnote_issues = []
+        # LLM review of footnote content (compliance, consistency, wording), fetched above
         footnote_issues_list = footnote_issues_list + llm_footnote_issues
         for u in color_issues:
             bbox = u.get("bbox")
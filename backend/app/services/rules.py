@@ -25,16 +25,21 @@ def classify_risk_level(
     if checklist_violations is None:
         checklist_violations = []
     
-    # Count critical missing elements (required statements marked with *)
-    critical_missing = len([p for p in missing_phrases if p.required])
-    total_violations = critical_missing + len(checklist_violations)
-    
-    # HIGH risk: 3+ missing requirements or critical violations
-    if total_violations >= 3 or checklist_violations:
+    # HIGH risk: any checklist violation
+    if checklist_violations:
         return RiskLevel.HIGH
     
+    # Count critical missing elements (required statements marked with *); stop once HIGH is certain
+    critical_missing = 0
+    for p in missing_phrases:
+        if p.required:
+            critical_missing += 1
+            # HIGH risk: 3+ missing requirements
+            if critical_missing >= 3:
+                return RiskLevel.HIGH
+    
     # MEDIUM risk: 1-2 missing requirements
-    if total_violations >= 1:
+    if critical_missing >= 1:
         return RiskLevel.MEDIUM
     
     # LOW risk: All requirements met
@@ -57,11 +62,5 @@ def determine_approval_status(
     Returns:
         True if approved (LOW risk, no missing requirements), False otherwise
     """
-    if checklist_violations is None:
-        checklist_violations = []
-    
     # Only approve if risk is LOW and no missing requirements
-    if risk_level == RiskLevel.LOW:
-        return len(missing_phrases) == 0 and len(checklist_violations) == 0
-    
-    return False
+    return risk_level == RiskLevel.LOW and not missing_phrases and not checklist_violations